@@ -0,0 +1,152 @@
+import argparse
+import json
+import multiprocessing
+import sys
+from collections import defaultdict
+
+import degrees
+
+
+def read_pairs(f):
+    """
+    Yields (source, target) pairs from `f`, one per line, either as a
+    JSON list or object ({"source": ..., "target": ...}) or as two
+    tab-separated fields. Blank lines and lines starting with # are skipped.
+
+    A line that is not a pair is yielded as (line, None).
+    """
+    for line in f:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            source, target = parse_pair(line)
+        except ValueError:
+            yield line, None
+            continue
+        yield str(source).strip(), str(target).strip()
+
+
+def parse_pair(line):
+    """
+    Returns the two values of a query line, raising ValueError if it is
+    not a pair.
+    """
+    if line[0] in "[{":
+        pair = json.loads(line)
+        if isinstance(pair, dict):
+            if "source" not in pair or "target" not in pair:
+                raise ValueError("missing source or target")
+            pair = (pair["source"], pair["target"])
+        if not isinstance(pair, (list, tuple)) or len(pair) != 2:
+            raise ValueError("not a pair")
+        return pair
+    fields = line.split("\t")
+    if len(fields) != 2:
+        raise ValueError("not two tab-separated fields")
+    return fields
+
+
+def resolve(value):
+    """
+    Returns the person ID for `value`, which may be an ID or an exact
+    name, or None if it is unknown or names several people.
+    """
+    if value in degrees.people:
+        return value
+    person_ids = degrees.names.get(value.lower(), ())
+    if len(person_ids) == 1:
+        return next(iter(person_ids))
+    return None
+
+
+def answer(group):
+    """
+    Answers every query sharing one source with a single BFS tree,
+    returning a list of JSON-ready results.
+    """
+    source, targets = group
+    paths = degrees.shortest_paths(source, targets.keys())
+    results = []
+    for target, queries in targets.items():
+        path = paths[target]
+        for query in queries:
+            results.append({
+                "source": query[0],
+                "target": query[1],
+                "degrees": None if path is None else len(path),
+                "path": path
+            })
+    return results
+
+
+def run(pairs, out, processes=None):
+    """
+    Resolves `pairs`, groups them by source and answers the groups over
+    a process pool, writing one JSON line per query to `out`.
+
+    Returns the numbers of queries answered and of lines answered
+    with an error instead.
+    """
+    # Maps source ID to target ID to the original queries asking for it
+    groups = defaultdict(lambda: defaultdict(list))
+    count = errors = 0
+    for query in pairs:
+        if query[1] is None:
+            out.write(json.dumps({
+                "line": query[0],
+                "error": "not a (source, target) pair"
+            }) + "\n")
+            errors += 1
+            continue
+        source, target = resolve(query[0]), resolve(query[1])
+        if source is None or target is None:
+            out.write(json.dumps({
+                "source": query[0],
+                "target": query[1],
+                "error": "person not found or ambiguous"
+            }) + "\n")
+            errors += 1
+        else:
+            groups[source][target].append(query)
+            count += 1
+
+    # Forked workers share the loaded graph copy-on-write
+    context = multiprocessing.get_context("fork")
+    with context.Pool(processes) as pool:
+        for results in pool.imap_unordered(answer, groups.items()):
+            for result in results:
+                out.write(json.dumps(result) + "\n")
+    return count, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Answer (source, target) degrees queries in bulk as JSON lines.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("-i", "--input", default="-",
+                        help="file of queries, one pair per line (default: stdin)")
+    parser.add_argument("-o", "--output", default="-",
+                        help="file to write JSON lines to (default: stdout)")
+    parser.add_argument("-j", "--processes", type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--dict", action="store_true",
+                        help="use dicts of sets instead of the compact graph store "
+                             "(loads cannot resume)")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="memory-map a compiled snapshot if there is one")
+    args = parser.parse_args()
+
+    print("Loading data...", file=sys.stderr)
+    degrees.load_data(args.directory, compact=not args.dict, snapshot=args.snapshot)
+    print("Data loaded.", file=sys.stderr)
+
+    infile = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    outfile = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    with infile, outfile:
+        count, errors = run(read_pairs(infile), outfile, args.processes)
+    print(f"Answered {count} queries, {errors} errors.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
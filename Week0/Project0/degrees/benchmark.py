@@ -0,0 +1,228 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+FIRST = ["Ada", "Alan", "Bette", "Cary", "Diane", "Emma", "Frank", "Grace",
+         "Henry", "Ingrid", "James", "Kate", "Leo", "Meryl", "Orson", "Tom"]
+LAST = ["Bacon", "Bergman", "Davis", "Grant", "Hanks", "Hepburn", "Keaton",
+        "Kelly", "Lee", "Moore", "Smith", "Stone", "Taylor", "Welles", "Wood"]
+
+BACKENDS = ("dict", "compact", "snapshot")
+
+# How often run() checks on a measuring process
+POLL_SECONDS = 1
+
+
+def generate(directory, stars, seed=0, alpha=1.5, max_cast=200):
+    """
+    Writes synthetic people.csv, movies.csv and stars.csv with about
+    `stars` rows in stars.csv to `directory`.
+
+    Cast sizes follow a Pareto distribution with shape `alpha`, and
+    casting favours low-numbered people, so a few prolific actors act
+    as hubs as they do in the IMDb data.
+    """
+    rng = random.Random(seed)
+    people = max(2, stars // 4)
+    os.makedirs(directory, exist_ok=True)
+
+    with open(os.path.join(directory, "people.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_NONNUMERIC)
+        writer.writerow(["id", "name", "birth"])
+        for p in range(people):
+            name = f"{rng.choice(FIRST)} {rng.choice(LAST)}"
+            if rng.random() < 0.5:
+                name += f" {rng.randrange(1000)}"
+            writer.writerow([p, name, rng.randint(1900, 2005)])
+
+    movies = 0
+    with open(os.path.join(directory, "stars.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        written = 0
+        while written < stars:
+            cast = min(max_cast, int(rng.paretovariate(alpha)), stars - written)
+            for p in {int(people * rng.random() ** 3) for _ in range(cast)}:
+                writer.writerow([p, movies])
+                written += 1
+            movies += 1
+
+    with open(os.path.join(directory, "movies.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_NONNUMERIC)
+        writer.writerow(["id", "title", "year"])
+        for m in range(movies):
+            writer.writerow([m, f"Movie {m}", rng.randint(1920, 2024)])
+
+    return {"people": people, "movies": movies, "stars": written}
+
+
+def percentiles(samples):
+    """
+    Summarizes latency samples in seconds as milliseconds.
+    """
+    ordered = sorted(samples)
+    if not ordered:
+        return {}
+
+    def at(q):
+        return 1000 * ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+    return {
+        "count": len(ordered),
+        "mean_ms": 1000 * sum(ordered) / len(ordered),
+        "p50_ms": at(50),
+        "p90_ms": at(90),
+        "p99_ms": at(99),
+        "max_ms": 1000 * ordered[-1]
+    }
+
+
+def measure(directory, backend, queries, seed, results):
+    """
+    Runs in a fresh process: loads the data with `backend` and times
+    neighbors_for_person and random shortest_path queries, putting the
+    measurements on the `results` queue.
+    """
+    import degrees
+
+    start = time.perf_counter()
+    degrees.load_data(directory, compact=backend != "dict", snapshot=backend == "snapshot")
+    load = time.perf_counter() - start
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    rng = random.Random(seed)
+    people = list(degrees.people)
+
+    neighbors = []
+    for _ in range(queries):
+        person_id = rng.choice(people)
+        start = time.perf_counter()
+        degrees.neighbors_for_person(person_id)
+        neighbors.append(time.perf_counter() - start)
+
+    paths = {"unidirectional": [], "bidirectional": []}
+    connected = 0
+    for _ in range(queries):
+        source, target = rng.choice(people), rng.choice(people)
+        for mode, samples in paths.items():
+            start = time.perf_counter()
+            path = degrees.shortest_path(source, target,
+                                         bidirectional=mode == "bidirectional")
+            samples.append(time.perf_counter() - start)
+        connected += path is not None
+
+    results.put({
+        "backend": backend,
+        "load_s": load,
+        # ru_maxrss is in kilobytes on Linux but bytes on macOS
+        "peak_rss_mb": rss / (1 << 20 if sys.platform == "darwin" else 1 << 10),
+        "neighbors_for_person": percentiles(neighbors),
+        "shortest_path": {mode: percentiles(samples) for mode, samples in paths.items()},
+        "connected_pairs": connected
+    })
+
+
+def run(directory, backend, queries, seed, timeout=None):
+    """
+    Measures one backend in a spawned process, so peak RSS and import
+    state are not shared between backends.
+
+    If the process dies (say of a MemoryError on a large dataset) or
+    takes longer than `timeout` seconds, returns a record of the failure
+    instead of measurements.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=measure,
+                              args=(directory, backend, queries, seed, results))
+    process.start()
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    result = failure = None
+    while result is None and failure is None:
+        try:
+            result = results.get(timeout=POLL_SECONDS)
+        except queue.Empty:
+            if process.exitcode is not None:
+                # The result may have arrived just before the exit
+                try:
+                    result = results.get(timeout=POLL_SECONDS)
+                except queue.Empty:
+                    failure = f"exited with code {process.exitcode}"
+            elif deadline is not None and time.monotonic() > deadline:
+                process.terminate()
+                failure = f"timed out after {timeout:g}s"
+
+    process.join()
+    if failure is not None:
+        return {"backend": backend, "failed": failure}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark degrees loading and queries on synthetic data.")
+    parser.add_argument("--stars", type=int, nargs="+", default=[10_000, 100_000],
+                        help="stars.csv sizes to benchmark (default: 10000 100000)")
+    parser.add_argument("--queries", type=int, default=200,
+                        help="random queries per measurement")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="seconds allowed per backend measurement (default: no limit)")
+    parser.add_argument("--keep", metavar="DIRECTORY",
+                        help="write the generated datasets here instead of a temporary directory")
+    parser.add_argument("-o", "--output", default="-",
+                        help="file to write JSON results to (default: stdout)")
+    args = parser.parse_args()
+
+    from snapshot import compile_snapshot
+
+    root = args.keep or tempfile.mkdtemp(prefix="degrees-benchmark-")
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "queries": args.queries,
+        "runs": []
+    }
+    try:
+        for stars in args.stars:
+            directory = os.path.join(root, str(stars))
+            print(f"Generating {stars:,} stars...", file=sys.stderr)
+            start = time.perf_counter()
+            sizes = generate(directory, stars, args.seed)
+            generated = time.perf_counter() - start
+
+            if "snapshot" in args.backends:
+                compile_snapshot(directory)
+            for backend in args.backends:
+                print(f"  {backend}...", file=sys.stderr)
+                result = run(directory, backend, args.queries, args.seed, args.timeout)
+                if "failed" in result:
+                    print(f"    failed: {result['failed']}", file=sys.stderr)
+                report["runs"].append({**sizes, "generate_s": generated, **result})
+    finally:
+        if not args.keep:
+            shutil.rmtree(root)
+
+    text = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,15 @@
-import csv
+import argparse
+import itertools
+import math
+import os
 import sys
-from collections import deque
 
-from util import Node, StackFrontier, QueueFrontier
+from graph import load_compact
+from ingest import Progress, paused_gc, read_chunks
+from nameindex import NameIndex
+from landmarks import load_or_build
+from snapshot import load_snapshot
+from util import LRUCache, Node, StackFrontier, QueueFrontier
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -13,55 +20,137 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# CompactGraph backing `names`, `people` and `movies` when loaded compactly
+graph = None
 
-def load_data(directory):
+# LRUCache of neighbors_for_person (and, on the compact store,
+# neighbors_for_index) results, set by enable_neighbor_cache
+neighbor_cache = None
+
+# NameIndex over all names, built by ranked_names on first use
+name_index = None
+
+
+@paused_gc()
+def load_data(directory, compact=False, progress=False, snapshot=False):
     """
     Load data from CSV files into memory.
+
+    With `compact`, IDs are interned to integers and memberships are held
+    in CSR arrays; `names`, `people` and `movies` become read-only views.
+    With `snapshot`, an up-to-date snapshot compiled by snapshot.py is
+    memory-mapped instead when there is one: it starts almost instantly
+    but looks IDs up by binary search, so queries are several times
+    slower than on the compact store.
+    With `progress`, rows/sec and skipped rows are reported to stderr.
+
+    Only the compact load checkpoints stars.csv, so only it resumes
+    where an interrupted load stopped; the dict load starts over.
     """
+    global names, people, movies, graph, name_index
+    if neighbor_cache is not None:
+        neighbor_cache.clear()
+    name_index = None
+    graph = load_snapshot(directory) if snapshot else None
+    if graph is None and compact:
+        graph = load_compact(directory, progress)
+    if graph is not None:
+        names, people, movies = graph.names, graph.people, graph.movies
+        return
+
+    names, people, movies = {}, {}, {}
+
     # Load people
-    with open(f"{directory}/people.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
+    path = f"{directory}/people.csv"
+    status = Progress("people.csv", os.path.getsize(path), progress)
+    for rows, malformed, position in read_chunks(path, ("id", "name", "birth")):
+        for person_id, name, birth in rows:
+            people[person_id] = {
+                "name": name,
+                "birth": birth,
                 "movies": set()
             }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
+            key = name.lower()
+            person_ids = names.get(key)
+            if person_ids is None:
+                names[key] = {person_id}
             else:
-                names[row["name"].lower()].add(row["id"])
+                person_ids.add(person_id)
+        status.advance(len(rows), malformed, position)
+    status.finish()
 
     # Load movies
-    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
+    path = f"{directory}/movies.csv"
+    status = Progress("movies.csv", os.path.getsize(path), progress)
+    for rows, malformed, position in read_chunks(path, ("id", "title", "year")):
+        for movie_id, title, year in rows:
+            movies[movie_id] = {
+                "title": title,
+                "year": year,
                 "stars": set()
             }
+        status.advance(len(rows), malformed, position)
+    status.finish()
 
-    # Load stars
-    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
+    # Load stars, counting rows that reference unknown IDs
+    path = f"{directory}/stars.csv"
+    status = Progress("stars.csv", os.path.getsize(path), progress)
+    for rows, malformed, position in read_chunks(path, ("person_id", "movie_id")):
+        skipped = malformed
+        for person_id, movie_id in rows:
             try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
+                person_movies = people[person_id]["movies"]
+                movie_stars = movies[movie_id]["stars"]
             except KeyError:
-                pass
+                skipped += 1
+                continue
+            person_movies.add(movie_id)
+            movie_stars.add(person_id)
+        status.advance(len(rows) + malformed, skipped, position)
+    status.finish()
+
+
+def ranked_names():
+    """
+    Returns the NameIndex over all names, building it on first use.
+
+    Building it reads every name and movie count, which would dominate
+    a snapshot's cold start, so loads leave it to the first query that
+    needs ranking; exact lookups go through `names` instead.
+    """
+    global name_index
+    if name_index is None:
+        if graph is not None:
+            name_index = graph.name_index()
+        else:
+            name_index = NameIndex.from_names(
+                names, lambda person_id: len(people[person_id]["movies"]),
+                lambda person_id: people[person_id]["birth"]
+            )
+    return name_index
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--dict", action="store_true",
+                        help="use dicts of sets instead of the compact graph store "
+                             "(loads cannot resume)")
+    parser.add_argument("--bidirectional", action="store_true",
+                        help="search from both people towards each other")
+    parser.add_argument("--landmarks", type=int, metavar="K",
+                        help="answer with a K-landmark distance index (overrides --dict)")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="memory-map a compiled snapshot if there is one")
+    args = parser.parse_args()
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    load_data(args.directory, compact=not args.dict or bool(args.landmarks),
+              progress=True, snapshot=args.snapshot)
     print("Data loaded.")
+    if args.landmarks:
+        index = load_or_build(graph, args.directory, args.landmarks)
 
     source = person_id_for_name(input("Name: "))
     if source is None:
@@ -72,7 +161,18 @@ def main():
     # source = person_id_for_name("Tom Hanks")
     # target = person_id_for_name("Kevin Bacon")
 
-    path = shortest_path(source, target)
+    if args.landmarks:
+        lower, upper = index.bounds(source, target)
+        if lower == math.inf:
+            path = None
+        else:
+            if upper == math.inf:
+                print(f"At least {lower} degrees of separation.")
+            else:
+                print(f"Between {lower} and {upper} degrees of separation.")
+            path = index.shortest_path(source, target)
+    else:
+        path = shortest_path(source, target, bidirectional=args.bidirectional)
 
     if path is None:
         print("Not connected.")
@@ -87,7 +187,7 @@ def main():
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def shortest_path(source, target, bidirectional=False):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
@@ -96,25 +196,155 @@ def shortest_path(source, target):
     """
     if source == target:
         return []
+    search = bidirectional_path if bidirectional else breadth_first_path
+
+    # The compact store is searched by person index, converting
+    # back to IDs only for the path found
+    if graph is not None:
+        index = graph.person_index
+        path = search(index[source], index[target], neighbors_for_index)
+        return None if path is None else graph.path_ids(path)
+    return search(source, target, neighbors_for_person)
+
+
+def breadth_first_path(source, target, neighbors):
+    """
+    Returns the shortest list of (action, state) pairs leading from
+    `source` to `target`, where `neighbors(state)` gives the (action,
+    state) pairs reachable in one step, or None if there is none.
+    """
+    # Nodes hold a person as state and the shared movie as action;
+    # the path is rebuilt from parent pointers once the target is found
+    frontier = QueueFrontier()
+    frontier.add(Node(source, None, None))
+    visited = {source}
+
+    while not frontier.empty():
+        node = frontier.remove()
+
+        for movie, person in neighbors(node.state):
+            if person in visited:
+                continue
+            child = Node(person, node, movie)
+            if person == target:
+                return path_to(child)
+            visited.add(person)
+            frontier.add(child)
+
+    return None
+
+
+def shortest_paths(source, targets):
+    """
+    Returns a dict mapping each of `targets` to its shortest path from
+    `source` (as shortest_path would), or None if not connected.
+
+    A single BFS tree from the source answers every target, and the
+    search stops as soon as the last target is reached.
+    """
+    if graph is not None:
+        index = graph.person_index
+        paths = breadth_first_paths(index[source], [index[target] for target in targets],
+                                    neighbors_for_index)
+        return {graph.person_ids[target]: None if path is None else graph.path_ids(path)
+                for target, path in paths.items()}
+    return breadth_first_paths(source, targets, neighbors_for_person)
+
+
+def breadth_first_paths(source, targets, neighbors):
+    """
+    Returns a dict mapping each of `targets` to the path
+    breadth_first_path would find to it, or None.
+    """
+    remaining = set(targets)
+    paths = {target: None for target in remaining}
+    if source in remaining:
+        paths[source] = []
+        remaining.discard(source)
+
+    frontier = QueueFrontier()
+    frontier.add(Node(source, None, None))
+    visited = {source}
+
+    while not frontier.empty() and remaining:
+        node = frontier.remove()
+
+        for movie, person in neighbors(node.state):
+            if person in visited:
+                continue
+            child = Node(person, node, movie)
+            if person in remaining:
+                paths[person] = path_to(child)
+                remaining.discard(person)
+            visited.add(person)
+            frontier.add(child)
+
+    return paths
 
-    frontier = deque()
-    visited = set()
-    for mov, per in neighbors_for_person(source):
-        if per == target:
-            return [(mov, per)]
-        frontier.append((mov, per, [(mov, per)]))
-        visited.add((mov, source))
-
-    while frontier:
-        curr_movie, curr_person, path = frontier.popleft()
-        visited.add((curr_movie, curr_person))
-
-        for movie, person in neighbors_for_person(curr_person):
-            new = (movie, person, path+[(movie, person)])
-            if (movie, person) not in visited:
-                if person == target:
-                    return new[2]
-                frontier.append(new)
+
+def path_to(node):
+    """
+    Returns the (action, state) pairs leading from the root
+    of the search tree to `node`.
+    """
+    path = []
+    while node.parent is not None:
+        path.append((node.action, node.state))
+        node = node.parent
+    path.reverse()
+    return path
+
+
+def bidirectional_path(source, target, neighbors):
+    """
+    Returns the same kind of path as breadth_first_path, growing BFS layers
+    from both the source and the target and always expanding the smaller
+    frontier, so only the neighbourhoods of the two ends are explored.
+    """
+    # Maps each reached person to the (movie, person) step
+    # leading back towards the side's root
+    forward = {source: None}
+    backward = {target: None}
+    forward_frontier = [source]
+    backward_frontier = [target]
+
+    def expand(frontier, parents, others):
+        """
+        Expands one full layer, returning the next layer and the first
+        person already reached from the other side (or None).
+        """
+        layer = []
+        for person in frontier:
+            for movie, neighbor in neighbors(person):
+                if neighbor in parents:
+                    continue
+                parents[neighbor] = (movie, person)
+                if neighbor in others:
+                    return layer, neighbor
+                layer.append(neighbor)
+        return layer, None
+
+    while forward_frontier and backward_frontier:
+        if len(forward_frontier) <= len(backward_frontier):
+            forward_frontier, meeting = expand(forward_frontier, forward, backward)
+        else:
+            backward_frontier, meeting = expand(backward_frontier, backward, forward)
+
+        # Layers are disjoint until now, so the first meeting is optimal
+        if meeting is not None:
+            path = []
+            person = meeting
+            while forward[person] is not None:
+                movie, parent = forward[person]
+                path.append((movie, person))
+                person = parent
+            path.reverse()
+
+            person = meeting
+            while backward[person] is not None:
+                movie, person = backward[person]
+                path.append((movie, person))
+            return path
 
     return None
 
@@ -124,7 +354,7 @@ def person_id_for_name(name):
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
     """
-    person_ids = list(names.get(name.lower(), set()))
+    person_ids = list(names.get(name.lower(), ()))
     if len(person_ids) == 0:
         return None
     elif len(person_ids) > 1:
@@ -145,11 +375,69 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def person_ids_for_name(name, birth=None, limit=10, fuzzy=False):
+    """
+    Returns up to `limit` candidate person_ids for a name without
+    prompting, most movies first: exact matches, or else prefix matches,
+    or else (with `fuzzy`) names within two edits, narrowed to `birth`
+    if given.
+
+    Exact and prefix lookups take microseconds. The fuzzy tier is the
+    slow one, taking milliseconds per query on large datasets, so it
+    only runs when asked for.
+    """
+    # The first kind of match that exists at all is narrowed by birth
+    index = ranked_names()
+    if name.lower() in names:
+        return index.exact(name, limit, birth)
+    if index.prefix(name, 1):
+        return index.prefix(name, limit, birth)
+    if fuzzy:
+        return index.fuzzy(name, limit=limit, birth=birth)
+    return []
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
+
+    While the neighbor cache is enabled, results are frozensets
+    shared between callers.
+    """
+    if neighbor_cache is not None:
+        neighbors = neighbor_cache.get(person_id)
+        if neighbors is None:
+            neighbors = frozenset(load_neighbors(person_id))
+            neighbor_cache.put(person_id, neighbors)
+        return neighbors
+    return load_neighbors(person_id)
+
+
+def neighbors_for_index(p):
     """
+    Returns (movie index, person index) pairs for everyone who starred
+    with person index `p` of the compact store, the searches' neighbor
+    lookup there.
+
+    While the neighbor cache is enabled, results are tuples shared
+    between callers.
+    """
+    if neighbor_cache is not None:
+        neighbors = neighbor_cache.get(p)
+        if neighbors is None:
+            neighbors = tuple(graph.neighbor_indices(p))
+            neighbor_cache.put(p, neighbors)
+        return neighbors
+    return graph.neighbor_indices(p)
+
+
+def load_neighbors(person_id):
+    """
+    Builds the neighbor set of a person from the loaded data.
+    """
+    if graph is not None:
+        return graph.neighbors(person_id)
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
@@ -158,5 +446,33 @@ def neighbors_for_person(person_id):
     return neighbors
 
 
+def enable_neighbor_cache(max_entries=100_000, max_bytes=None):
+    """
+    Caches neighbors_for_person and neighbors_for_index results in an
+    LRUCache bounded by entry count and approximate bytes, returning the
+    cache for its counters.
+    """
+    global neighbor_cache
+
+    def sizeof(neighbors):
+        # Every pair is its own tuple holding its own two objects
+        size = sys.getsizeof(neighbors)
+        for movie, person in itertools.islice(neighbors, 1):
+            pair = sys.getsizeof((movie, person))
+            size += len(neighbors) * (pair + sys.getsizeof(movie) + sys.getsizeof(person))
+        return size
+
+    neighbor_cache = LRUCache(max_entries, max_bytes, sizeof=sizeof)
+    return neighbor_cache
+
+
+def disable_neighbor_cache():
+    """
+    Drops the neighbor cache, returning to uncached lookups.
+    """
+    global neighbor_cache
+    neighbor_cache = None
+
+
 if __name__ == "__main__":
     main()
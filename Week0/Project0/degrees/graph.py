@@ -0,0 +1,517 @@
+import os
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping, Sequence
+from itertools import accumulate, repeat
+
+from ingest import (Progress, fingerprint, load_checkpoint, paused_gc,
+                    read_chunks, save_checkpoint)
+from nameindex import KeyTable, NameIndex
+
+# Partial stars.csv ingest state, kept only while a load is interrupted
+CHECKPOINT = "degrees.ingest"
+
+
+class CompactGraph():
+    """
+    Person/movie bipartite graph with IDs interned to dense integers.
+
+    Memberships are kept in CSR form: the movies of person `p` are
+    `person_movies[person_offsets[p]:person_offsets[p + 1]]`, and the
+    stars of movie `m` are `movie_stars[movie_offsets[m]:movie_offsets[m + 1]]`.
+    """
+
+    def __init__(self, person_ids, person_names, person_births,
+                 movie_ids, movie_titles, movie_years,
+                 person_offsets, person_movies,
+                 movie_offsets, movie_stars,
+                 person_index, movie_index, names):
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_stars = movie_stars
+        self.person_index = person_index
+        self.movie_index = movie_index
+        self.names = names
+        self.people = PeopleView(self)
+        self.movies = MoviesView(self)
+
+    def movies_of(self, p):
+        """
+        Returns the movie indices person index `p` starred in.
+        """
+        return self.person_movies[self.person_offsets[p]:self.person_offsets[p + 1]]
+
+    def stars_of(self, m):
+        """
+        Returns the person indices starring in movie index `m`.
+        """
+        return self.movie_stars[self.movie_offsets[m]:self.movie_offsets[m + 1]]
+
+    def neighbor_indices(self, p):
+        """
+        Returns (movie index, person index) pairs for everyone who
+        starred with person index `p`, `p` itself included.
+        """
+        neighbors = []
+        for m in self.movies_of(p):
+            neighbors += zip(repeat(m), self.stars_of(m))
+        return neighbors
+
+    def path_ids(self, path):
+        """
+        Converts a path of (movie index, person index) pairs into
+        (movie_id, person_id) pairs.
+        """
+        return [(self.movie_ids[m], self.person_ids[p]) for m, p in path]
+
+    def name_index(self):
+        """
+        Returns a NameIndex over this graph's sorted name table.
+        """
+        names = self.names
+        offsets = self.person_offsets
+        counts = array("i", [offsets[p + 1] - offsets[p] for p in names.order])
+        return NameIndex(KeyTable.build(names.keys), SortedKeys(self.person_ids, names.order),
+                         counts, SortedKeys(self.person_births, names.order))
+
+    def neighbors(self, person_id):
+        """
+        Returns (movie_id, person_id) pairs for people
+        who starred with a given person.
+        """
+        neighbors = set()
+        for m in self.movies_of(self.person_index[person_id]):
+            stars = self.person_ids.take(self.stars_of(m))
+            neighbors.update(zip(repeat(self.movie_ids[m]), stars))
+        return neighbors
+
+
+class PeopleView(Mapping):
+    """
+    Read-only `people` mapping over a CompactGraph, producing the same
+    {"name", "birth", "movies"} records as the dict backend on demand.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, person_id):
+        graph = self.graph
+        p = graph.person_index[person_id]
+        return {
+            "name": graph.person_names[p],
+            "birth": graph.person_births[p],
+            "movies": {graph.movie_ids[m] for m in graph.movies_of(p)}
+        }
+
+    def __contains__(self, person_id):
+        return person_id in self.graph.person_index
+
+    def __iter__(self):
+        return iter(self.graph.person_ids)
+
+    def __len__(self):
+        return len(self.graph.person_ids)
+
+
+class MoviesView(Mapping):
+    """
+    Read-only `movies` mapping over a CompactGraph, producing the same
+    {"title", "year", "stars"} records as the dict backend on demand.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, movie_id):
+        graph = self.graph
+        m = graph.movie_index[movie_id]
+        return {
+            "title": graph.movie_titles[m],
+            "year": graph.movie_years[m],
+            "stars": {graph.person_ids[p] for p in graph.stars_of(m)}
+        }
+
+    def __contains__(self, movie_id):
+        return movie_id in self.graph.movie_index
+
+    def __iter__(self):
+        return iter(self.graph.movie_ids)
+
+    def __len__(self):
+        return len(self.graph.movie_ids)
+
+
+class StringTable(Sequence):
+    """
+    Sequence of strings stored as one UTF-8 blob plus an offsets array,
+    so it can be appended to in memory or live in a memory-mapped file
+    without per-string objects.
+    """
+
+    def __init__(self, offsets=None, blob=None):
+        self.offsets = array("q", [0]) if offsets is None else offsets
+        self.blob = bytearray() if blob is None else blob
+
+    @classmethod
+    def build(cls, strings):
+        """
+        Packs `strings` into an in-memory StringTable.
+        """
+        table = cls()
+        for s in strings:
+            table.append(s)
+        return table
+
+    def append(self, s):
+        """
+        Adds `s` to the end of an in-memory table.
+        """
+        self.blob += s.encode("utf-8")
+        self.offsets.append(len(self.blob))
+
+    def extend(self, strings):
+        """
+        Adds each of `strings` to the end of an in-memory table.
+        """
+        encoded = [s.encode("utf-8") for s in strings]
+        self.offsets += array("q", accumulate(map(len, encoded), initial=len(self.blob)))[1:]
+        self.blob += b"".join(encoded)
+
+    def __getitem__(self, i):
+        offsets = self.offsets
+        if i < 0:
+            i += len(offsets) - 1
+            if i < 0:
+                raise IndexError("string table index out of range")
+
+        # offsets[i + 1] itself is out of range past the last string
+        return str(self.blob[offsets[i]:offsets[i + 1]], "utf-8")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        blob = self.blob
+        offsets = self.offsets
+        text = str(blob, "utf-8")
+
+        # Byte offsets are character offsets when every string is ASCII
+        if len(text) == len(blob):
+            return map(text.__getitem__, map(slice, offsets, offsets[1:]))
+        return (str(blob[a:b], "utf-8") for a, b in zip(offsets, offsets[1:]))
+
+    def take(self, indices):
+        """
+        Returns an iterator over the strings at `indices`.
+        """
+        return map(self.__getitem__, indices)
+
+
+def is_number(s):
+    """
+    Returns True if `s` is an integer that fits in 64 bits, written
+    exactly as str() would write it.
+    """
+    try:
+        value = int(s)
+    except ValueError:
+        return False
+    return -1 << 63 <= value < 1 << 63 and str(value) == s
+
+
+class IdTable(Sequence):
+    """
+    Sequence of ID strings, extended in order. While every ID is a
+    64-bit integer written exactly as str() would write it, it is stored
+    as that integer; the first other ID switches the table to a list of
+    strings.
+    """
+
+    def __init__(self):
+        self.values = array("q")
+        self.strings = None
+
+    def extend(self, ids):
+        if self.strings is None:
+            try:
+                values = array("q", map(int, ids))
+            except (ValueError, OverflowError):
+                values = None
+
+            # int() also accepts spaces, underscores and leading zeros,
+            # so only keep IDs that convert back to exactly themselves
+            if values is not None and ",".join(map(str, values)) == ",".join(ids):
+                self.values += values
+                return
+            self.strings = [str(value) for value in self.values]
+            self.values = None
+        self.strings += ids
+
+    def index(self):
+        """
+        Returns a mapping from each ID to its index, the last one for a
+        repeated ID.
+        """
+        if self.strings is None:
+            return NumberIndex(self.values)
+        return {s: i for i, s in enumerate(self.strings)}
+
+    def __getitem__(self, i):
+        if self.strings is None:
+            return str(self.values[i])
+        return self.strings[i]
+
+    def __iter__(self):
+        if self.strings is None:
+            return map(str, self.values)
+        return iter(self.strings)
+
+    def take(self, indices):
+        """
+        Returns an iterator over the IDs at `indices`.
+        """
+        if self.strings is None:
+            return map(str, map(self.values.__getitem__, indices))
+        return map(self.strings.__getitem__, indices)
+
+    def __len__(self):
+        return len(self.values if self.strings is None else self.strings)
+
+
+class NumberIndex():
+    """
+    Maps decimal ID strings to indices in `values` by bisecting a sorted
+    copy, the compact stand-in for a dict of numeric IDs.
+    """
+
+    def __init__(self, values):
+        self.order = array("i", sorted(range(len(values)), key=values.__getitem__))
+        self.sorted = array("q", [values[i] for i in self.order])
+
+    def get(self, key, default=None):
+        if not (isinstance(key, str) and is_number(key)):
+            return default
+        i = bisect_right(self.sorted, int(key)) - 1
+        if i >= 0 and self.sorted[i] == int(key):
+            return self.order[i]
+        return default
+
+    def __getitem__(self, key):
+        i = self.get(key)
+        if i is None:
+            raise KeyError(key)
+        return i
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+
+class SortedKeys(Sequence):
+    """
+    View of `strings` in the order given by `order`, optionally
+    transformed by `key`, for bisecting without materializing a list.
+    """
+
+    def __init__(self, strings, order, key=None):
+        self.strings = strings
+        self.order = order
+        self.key = key
+
+    def __getitem__(self, i):
+        s = self.strings[self.order[i]]
+        return s if self.key is None else self.key(s)
+
+    def __iter__(self):
+        # Reading every string in storage order once is much cheaper
+        # than reading them one at a time in sorted order
+        strings = list(self.strings)
+        ordered = map(strings.__getitem__, self.order)
+        return ordered if self.key is None else map(self.key, ordered)
+
+    def __len__(self):
+        return len(self.order)
+
+
+class SortedIndex():
+    """
+    Maps each string of `strings` to its index by bisecting a sorted
+    permutation, the mmap-friendly stand-in for a dict of IDs.
+    """
+
+    def __init__(self, strings, order):
+        self.keys = SortedKeys(strings, order)
+        self.order = order
+
+    def get(self, key, default=None):
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return self.order[i]
+        return default
+
+    def __getitem__(self, key):
+        i = self.get(key)
+        if i is None:
+            raise KeyError(key)
+        return i
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+
+class NameTable():
+    """
+    Maps lowercase names to tuples of person IDs by bisecting a
+    permutation of people sorted by lowercase name, the mmap-friendly
+    stand-in for the `names` dict.
+    """
+
+    def __init__(self, person_names, person_ids, order):
+        self.keys = SortedKeys(person_names, order, key=str.lower)
+        self.person_ids = person_ids
+        self.order = order
+
+    def get(self, name, default=None):
+        lo = bisect_left(self.keys, name)
+        hi = bisect_right(self.keys, name, lo)
+        if lo == hi:
+            return default
+        return tuple(self.person_ids[self.order[i]] for i in range(lo, hi))
+
+    def __getitem__(self, name):
+        ids = self.get(name)
+        if ids is None:
+            raise KeyError(name)
+        return ids
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+
+def csr(count, rows, cols):
+    """
+    Counting-sorts the (row, col) edge lists into CSR offset and index arrays.
+    """
+    offsets = array("q", bytes(8 * (count + 1)))
+    for row in rows:
+        offsets[row + 1] += 1
+    for i in range(count):
+        offsets[i + 1] += offsets[i]
+
+    cursor = array("q", offsets)
+    indices = array("i", bytes(4 * len(rows)))
+    for row, col in zip(rows, cols):
+        indices[cursor[row]] = col
+        cursor[row] += 1
+    return offsets, indices
+
+
+@paused_gc()
+def load_compact(directory, progress=False):
+    """
+    Load data from CSV files into a CompactGraph.
+
+    Files are streamed in chunks, reporting progress to stderr if
+    `progress` is set. If loading stars.csv is interrupted, the edges read
+    so far are checkpointed and the next call resumes from there.
+    """
+    # Repeated values (birth years, release years) share one string object
+    shared = {}
+
+    # Load people, keeping a plain dict of IDs (and the lowercase names)
+    # only until the stars are resolved and the names sorted
+    person_ids, person_names, person_births = IdTable(), StringTable(), []
+    person_lookup, lowercase = {}, []
+    path = f"{directory}/people.csv"
+    status = Progress("people.csv", os.path.getsize(path), progress)
+    for rows, malformed, position in read_chunks(path, ("id", "name", "birth")):
+        if rows:
+            ids, chunk_names, births = zip(*rows)
+            person_lookup.update(zip(ids, range(len(person_ids), len(person_ids) + len(ids))))
+            person_ids.extend(ids)
+            person_names.extend(chunk_names)
+            lowercase += map(str.lower, chunk_names)
+            person_births += map(shared.setdefault, births, births)
+        status.advance(len(rows), malformed, position)
+    status.finish()
+    person_index = person_ids.index()
+    name_order = array("i", sorted(range(len(person_ids)), key=lowercase.__getitem__))
+    del lowercase
+
+    # Load movies
+    movie_ids, movie_titles, movie_years = IdTable(), StringTable(), []
+    movie_lookup = {}
+    path = f"{directory}/movies.csv"
+    status = Progress("movies.csv", os.path.getsize(path), progress)
+    for rows, malformed, position in read_chunks(path, ("id", "title", "year")):
+        if rows:
+            ids, titles, years = zip(*rows)
+            movie_lookup.update(zip(ids, range(len(movie_ids), len(movie_ids) + len(ids))))
+            movie_ids.extend(ids)
+            movie_titles.extend(titles)
+            movie_years += map(shared.setdefault, years, years)
+        status.advance(len(rows), malformed, position)
+    status.finish()
+    movie_index = movie_ids.index()
+
+    # Load stars as parallel edge arrays, skipping (and counting) unknown IDs
+    path = f"{directory}/stars.csv"
+    checkpoint = f"{directory}/{CHECKPOINT}"
+    stamp = fingerprint(directory)
+    state = load_checkpoint(checkpoint, stamp) or {
+        "position": 0, "rows": 0, "skipped": 0,
+        "edge_people": array("i"), "edge_movies": array("i")
+    }
+    edge_people, edge_movies = state["edge_people"], state["edge_movies"]
+    status = Progress("stars.csv", os.path.getsize(path), progress)
+    status.advance(state["rows"], state["skipped"], state["position"])
+    try:
+        for rows, malformed, position in read_chunks(path, ("person_id", "movie_id"),
+                                                     state["position"]):
+            skipped = malformed
+            if rows:
+                person_column, movie_column = zip(*rows)
+                chunk_people = list(map(person_lookup.get, person_column))
+                chunk_movies = list(map(movie_lookup.get, movie_column))
+                if None in chunk_people or None in chunk_movies:
+                    edges = [(p, m) for p, m in zip(chunk_people, chunk_movies)
+                             if p is not None and m is not None]
+                    skipped += len(rows) - len(edges)
+                    chunk_people = [p for p, _ in edges]
+                    chunk_movies = [m for _, m in edges]
+                edge_people.extend(chunk_people)
+                edge_movies.extend(chunk_movies)
+
+            # Only whole chunks count as done, so a resume never repeats rows
+            state.update(position=position, rows=state["rows"] + len(rows) + malformed,
+                         skipped=state["skipped"] + skipped, edges=len(edge_people))
+            status.advance(len(rows) + malformed, skipped, position)
+    except KeyboardInterrupt:
+        edges = state.get("edges", 0)
+        del edge_people[edges:]
+        del edge_movies[edges:]
+        save_checkpoint(checkpoint, stamp, state)
+        raise
+    status.finish()
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    del person_lookup, movie_lookup
+
+    person_offsets, person_movies = csr(len(person_ids), edge_people, edge_movies)
+    movie_offsets, movie_stars = csr(len(movie_ids), edge_movies, edge_people)
+
+    return CompactGraph(
+        person_ids, person_names, person_births,
+        movie_ids, movie_titles, movie_years,
+        person_offsets, person_movies,
+        movie_offsets, movie_stars,
+        person_index, movie_index,
+        NameTable(person_names, person_ids, name_order)
+    )
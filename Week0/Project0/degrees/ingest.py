@@ -0,0 +1,159 @@
+import contextlib
+import csv
+import gc
+import io
+import itertools
+import operator
+import os
+import pickle
+import sys
+import time
+
+# Rows read per chunk; small enough that a chunk never dominates memory
+CHUNK_ROWS = 4096
+
+# Source files whose size and mtime identify a dataset version
+SOURCES = ("people.csv", "movies.csv", "stars.csv")
+
+
+def fingerprint(directory):
+    """
+    Returns the (mtime_ns, size) pairs of the source CSVs, flattened.
+    """
+    values = []
+    for name in SOURCES:
+        stat = os.stat(os.path.join(directory, name))
+        values += [stat.st_mtime_ns, stat.st_size]
+    return values
+
+
+@contextlib.contextmanager
+def paused_gc():
+    """
+    Pauses cyclic garbage collection while loading, since loads only
+    build acyclic records; otherwise each collection rescans every
+    record loaded so far. Also usable as a decorator.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def read_chunks(path, columns, start=0, chunk_rows=CHUNK_ROWS):
+    """
+    Streams the CSV at `path` in chunks of about `chunk_rows` rows,
+    starting at byte offset `start` (0 for the beginning of the data).
+
+    Yields (rows, malformed, position) where `rows` holds a tuple of the
+    values of the named `columns` (at least two) for each well-formed row, `malformed`
+    counts rows with missing fields and `position` is the byte offset
+    just after the chunk, from which a later call can resume.
+
+    Each chunk is read as a block of lines and decoded and parsed in
+    one go, so only the current chunk's rows are ever held in memory.
+    """
+    with open(path, "rb") as f:
+        header = next(csv.reader([f.readline().decode("utf-8")]))
+        indices = [header.index(column) for column in columns]
+        width = max(indices) + 1
+        select = operator.itemgetter(*indices)
+        if start:
+            f.seek(start)
+        position = f.tell()
+
+        while True:
+            data = b"".join(itertools.islice(f, chunk_rows))
+            if not data:
+                break
+
+            # A quoted field may span lines, so a chunk only ends once
+            # every quote in it is closed (escaped quotes come in pairs)
+            while data.count(b'"') % 2:
+                line = f.readline()
+                if not line:
+                    break
+                data += line
+            position += len(data)
+
+            rows = list(csv.reader(io.StringIO(data.decode("utf-8"), newline="")))
+            selected = [select(row) for row in rows if len(row) >= width]
+
+            # Blank lines parse as empty rows and are not malformed
+            yield selected, sum(map(bool, rows)) - len(selected), position
+
+
+class Progress():
+    """
+    Reports rows read, rows per second and skipped rows for one file,
+    redrawing a single status line on `stream` at most every `interval`
+    seconds.
+    """
+
+    def __init__(self, name, size, enabled=True, stream=sys.stderr, interval=0.5):
+        self.name = name
+        self.size = size
+        self.enabled = enabled
+        self.stream = stream
+        self.interval = interval
+        self.rows = 0
+        self.skipped = 0
+        self.position = 0
+        self.start = time.perf_counter()
+        self.shown = self.start
+
+    def rate(self):
+        elapsed = time.perf_counter() - self.start
+        return self.rows / elapsed if elapsed else 0.0
+
+    def advance(self, rows, skipped, position):
+        self.rows += rows
+        self.skipped += skipped
+        self.position = position
+        now = time.perf_counter()
+        if self.enabled and now - self.shown >= self.interval:
+            self.shown = now
+            self.show("\r")
+
+    def finish(self):
+        if self.enabled:
+            self.show("\r")
+            self.stream.write("\n")
+            self.stream.flush()
+
+    def show(self, prefix):
+        percent = 100 * self.position / self.size if self.size else 100
+        self.stream.write(
+            f"{prefix}{self.name}: {self.rows:,} rows ({self.rate():,.0f} rows/s), "
+            f"{self.skipped:,} skipped, {percent:.0f}%"
+        )
+        self.stream.flush()
+
+
+def save_checkpoint(path, stamp, state):
+    """
+    Atomically writes an ingest checkpoint `state` (any picklable dict)
+    tagged with the source fingerprint `stamp`.
+    """
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        pickle.dump({"stamp": stamp, "state": state}, f, pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, path)
+
+
+def load_checkpoint(path, stamp):
+    """
+    Returns the state saved at `path`, or None if there is no checkpoint
+    or it was taken against different source files.
+    """
+    try:
+        with open(path, "rb") as f:
+            checkpoint = pickle.load(f)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        return None
+    if checkpoint.get("stamp") != stamp:
+        return None
+    return checkpoint["state"]
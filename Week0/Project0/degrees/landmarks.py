@@ -0,0 +1,286 @@
+import heapq
+import math
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+
+from ingest import fingerprint
+
+LANDMARKS = "degrees.landmarks"
+MAGIC = b"DEGLMK01"
+
+# Distances are stored as int8; -1 means unreachable and CAP means "at least CAP"
+UNREACHABLE = -1
+CAP = 127
+
+# Magic, people count, landmark count, then the source CSV fingerprint
+HEADER = struct.Struct("=8sqq6q")
+
+
+def distances_from(graph, p):
+    """
+    Returns an int8 array of BFS distances from person index `p` to
+    every person in `graph`.
+    """
+    dist = array("b", [UNREACHABLE]) * len(graph.person_ids)
+    seen_movies = bytearray(len(graph.movie_ids))
+    dist[p] = 0
+    frontier = [p]
+    depth = 0
+    while frontier:
+        depth = min(depth + 1, CAP)
+        layer = []
+        for q in frontier:
+            for m in graph.movies_of(q):
+
+                # A movie links all its stars at once, so scan it only once
+                if seen_movies[m]:
+                    continue
+                seen_movies[m] = 1
+                for r in graph.stars_of(m):
+                    if dist[r] == UNREACHABLE:
+                        dist[r] = depth
+                        layer.append(r)
+        frontier = layer
+    return dist
+
+
+class LandmarkIndex():
+    """
+    ALT-style distance index: exact BFS distances from a few landmark
+    people to everyone, giving triangle-inequality bounds on the
+    distance between any two people.
+    """
+
+    def __init__(self, graph, landmarks, distances):
+        self.graph = graph
+        self.landmarks = landmarks
+        self.distances = distances
+
+    @classmethod
+    def build(cls, graph, k=16):
+        """
+        Picks the `k` people with the most co-star slots as landmarks and
+        computes their distance arrays.
+        """
+        def degree(p):
+            return sum(len(graph.stars_of(m)) for m in graph.movies_of(p))
+
+        people = range(len(graph.person_ids))
+        landmarks = array("i", heapq.nlargest(k, people, key=degree))
+        distances = [distances_from(graph, p) for p in landmarks]
+        return cls(graph, landmarks, distances)
+
+    def save(self, directory):
+        """
+        Persists the index next to the dataset in `directory`.
+        """
+        path = os.path.join(directory, LANDMARKS)
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(HEADER.pack(MAGIC, len(self.graph.person_ids),
+                                len(self.landmarks), *fingerprint(directory)))
+            f.write(self.landmarks)
+            for dist in self.distances:
+                f.write(dist)
+        os.replace(temporary, path)
+        return path
+
+    @classmethod
+    def load(cls, graph, directory):
+        """
+        Memory-maps the persisted index for `graph`, or returns None if
+        there is none or it was built from different data.
+        """
+        path = os.path.join(directory, LANDMARKS)
+        try:
+            with open(path, "rb") as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, n, k, *stamp = HEADER.unpack_from(buffer)
+        except (FileNotFoundError, ValueError, struct.error):
+            return None
+        if (magic != MAGIC or n != len(graph.person_ids)
+                or stamp != fingerprint(directory)):
+            return None
+
+        view = memoryview(buffer)
+        start = HEADER.size + 4 * k
+        landmarks = view[HEADER.size:start].cast("i")
+        distances = [view[start + i * n:start + (i + 1) * n].cast("b")
+                     for i in range(k)]
+        return cls(graph, landmarks, distances)
+
+    def bounds_between(self, s, t):
+        """
+        Returns (lower, upper) bounds on the distance between person
+        indices `s` and `t`; both are math.inf if they are not connected.
+        """
+        if s == t:
+            return 0, 0
+        lower, upper = 1, math.inf
+        for dist in self.distances:
+            ds, dt = dist[s], dist[t]
+            if ds == UNREACHABLE and dt == UNREACHABLE:
+                continue
+            if ds == UNREACHABLE or dt == UNREACHABLE:
+                return math.inf, math.inf
+
+            # Capped distances are still 1-Lipschitz, so only upper needs exact values
+            lower = max(lower, abs(ds - dt))
+            if ds != CAP and dt != CAP:
+                upper = min(upper, ds + dt)
+        return lower, upper
+
+    def bounds(self, source, target):
+        """
+        Returns (lower, upper) bounds on the degrees of separation
+        between two person IDs.
+        """
+        index = self.graph.person_index
+        return self.bounds_between(index[source], index[target])
+
+    def within(self, source, target, n):
+        """
+        Returns True if `source` and `target` are at most `n` degrees
+        apart, searching only when the bounds do not settle it.
+        """
+        lower, upper = self.bounds(source, target)
+        if upper <= n:
+            return True
+        if lower > n:
+            return False
+        return self.shortest_path(source, target, limit=n) is not None
+
+    def shortest_path(self, source, target, limit=None):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs from
+        `source` to `target`, or None if there is none (of at most
+        `limit` steps, if given).
+
+        Searches like degrees.bidirectional_path, but never deeper than
+        the landmark upper bound (or `limit`), skipping people whose
+        lower bound to the other end exceeds what is left of it.
+        """
+        graph = self.graph
+        s = graph.person_index[source]
+        t = graph.person_index[target]
+        if s == t:
+            return []
+        lower, upper = self.bounds_between(s, t)
+        budget = upper if limit is None else min(limit, upper)
+        if lower == math.inf or lower > budget:
+            return None
+
+        def lower_bound(p, ends):
+            """
+            Returns the landmark lower bound on the distance from person
+            index `p` to the person whose distances are `ends`.
+            """
+            h = 0
+            for dist, end in ends:
+                dp = dist[p]
+                if (dp == UNREACHABLE) != (end == UNREACHABLE):
+                    return math.inf
+                if abs(dp - end) > h:
+                    h = abs(dp - end)
+            return h
+
+        def expand(frontier, depth, side, other):
+            """
+            Expands one full layer at `depth` from one side, returning
+            the next layer and the first person already reached from the
+            other side (or None).
+            """
+            parents, movies, skipped, ends = side
+            room = budget - depth - 1
+            layer = []
+            for p in frontier:
+                for m in graph.movies_of(p):
+
+                    # A movie links all its stars at once, so scan it only once
+                    if m in movies:
+                        continue
+                    movies.add(m)
+                    for q in graph.stars_of(m):
+                        if q in parents or q in skipped:
+                            continue
+                        if q in other:
+                            parents[q] = (m, p)
+                            return layer, q
+                        if room != math.inf and lower_bound(q, ends) > room:
+                            skipped.add(q)
+                            continue
+                        parents[q] = (m, p)
+                        layer.append(q)
+            return layer, None
+
+        # Each side maps reached person indices to the (movie, person)
+        # step leading back to its root, and keeps the movies it scanned,
+        # the people it pruned and the distances of the other end
+        forward = ({s: None}, set(), set(), [(dist, dist[t]) for dist in self.distances])
+        backward = ({t: None}, set(), set(), [(dist, dist[s]) for dist in self.distances])
+        forward_frontier, backward_frontier = [s], [t]
+        forward_depth = backward_depth = 0
+
+        meeting = None
+        while (meeting is None and forward_frontier and backward_frontier
+               and forward_depth + backward_depth < budget):
+            if len(forward_frontier) <= len(backward_frontier):
+                forward_frontier, meeting = expand(forward_frontier, forward_depth,
+                                                   forward, backward[0])
+                forward_depth += 1
+            else:
+                backward_frontier, meeting = expand(backward_frontier, backward_depth,
+                                                    backward, forward[0])
+                backward_depth += 1
+        if meeting is None:
+            return None
+
+        path = []
+        p = meeting
+        while forward[0][p] is not None:
+            m, parent = forward[0][p]
+            path.append((graph.movie_ids[m], graph.person_ids[p]))
+            p = parent
+        path.reverse()
+
+        p = meeting
+        while backward[0][p] is not None:
+            m, p = backward[0][p]
+            path.append((graph.movie_ids[m], graph.person_ids[p]))
+        return path
+
+
+def load_or_build(graph, directory, k=16):
+    """
+    Returns the persisted landmark index for `graph`, building and
+    saving a new one first if it is missing or stale.
+    """
+    index = LandmarkIndex.load(graph, directory)
+    if index is None or len(index.landmarks) != k:
+        index = LandmarkIndex.build(graph, k)
+        index.save(directory)
+    return index
+
+
+def main():
+    if len(sys.argv) not in (2, 3):
+        sys.exit("Usage: python landmarks.py directory [landmarks]")
+    directory = sys.argv[1]
+    k = int(sys.argv[2]) if len(sys.argv) == 3 else 16
+
+    import degrees
+    print("Loading data...")
+    degrees.load_data(directory, compact=True)
+    print(f"Building {k} landmarks...")
+    start = time.perf_counter()
+    index = LandmarkIndex.build(degrees.graph, k)
+    path = index.save(directory)
+    print(f"Wrote {path} in {time.perf_counter() - start:.2f}s.")
+
+
+if __name__ == "__main__":
+    main()
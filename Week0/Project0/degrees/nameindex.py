@@ -0,0 +1,284 @@
+import heapq
+import itertools
+from array import array
+from bisect import bisect_left
+from collections.abc import Sequence
+
+# Sorts after every character a name can contain
+SENTINEL = "\U0010ffff"
+
+# Ranges up to this many names are ranked directly, without the tree
+SMALL_RANGE = 64
+
+# Ranges up to this many names are copied into a list for the fuzzy walk
+LOCAL_RANGE = 1024
+
+
+class KeyTable(Sequence):
+    """
+    Sequence of strings kept as one str plus an offsets array, so keys
+    cost no per-string objects and a range of them is copied out by
+    slicing alone.
+    """
+
+    def __init__(self, text, offsets):
+        self.text = text
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, strings):
+        """
+        Packs `strings` into a KeyTable.
+        """
+        strings = list(strings)
+        offsets = array("q", itertools.accumulate(map(len, strings), initial=0))
+        return cls("".join(strings), offsets)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            text, offsets = self.text, self.offsets
+            bounds = offsets[i.start:i.stop + 1]
+            return [text[a:b] for a, b in zip(bounds, bounds[1:])]
+        return self.text[self.offsets[i]:self.offsets[i + 1]]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+class NameIndex():
+    """
+    Lowercase names in sorted order, parallel to the person IDs they
+    belong to, supporting exact, prefix and bounded edit-distance lookup.
+
+    The sorted sequence doubles as an implicit trie: the names sharing a
+    prefix form one contiguous range, found by bisecting, so no extra
+    node structure is needed and the keys may be a KeyTable rather than
+    a list. `counts` holds each person's movie count and `births` (if
+    given) their birth year, both in the same order as the keys.
+
+    The segment tree and birth-year groups used for ranking are built
+    up front, so no query pays for them.
+    """
+
+    def __init__(self, keys, ids, counts, births=None):
+        self.keys = keys
+        self.ids = ids
+        self.counts = counts
+        self.births = births
+        self.build_tree()
+        self.by_birth = None if births is None else self.group_births()
+
+    @classmethod
+    def from_names(cls, names, movie_count, birth=None):
+        """
+        Builds an index from a `names` dict of lowercase name to person
+        IDs, looking up each person's movie count and birth year with
+        the `movie_count` and `birth` functions.
+        """
+        pairs = sorted(
+            (name, person_id)
+            for name, person_ids in names.items()
+            for person_id in person_ids
+        )
+        ids = [person_id for _, person_id in pairs]
+        return cls([name for name, _ in pairs], ids,
+                   array("i", map(movie_count, ids)),
+                   None if birth is None else [birth(person_id) for person_id in ids])
+
+    def build_tree(self):
+        """
+        Builds a max segment tree over the movie counts: node `v` holds
+        the position of the largest count under it (the first, on ties),
+        its children are `2v` and `2v + 1`, and leaf `size + i` is
+        position i. Unused leaves hold -1.
+        """
+        counts = self.counts
+        size = 1
+        while size < len(counts):
+            size *= 2
+        tree = array("i", [-1]) * (2 * size)
+        tree[size:size + len(counts)] = array("i", range(len(counts)))
+        for v in range(size - 1, 0, -1):
+            a, b = tree[2 * v], tree[2 * v + 1]
+            tree[v] = a if b < 0 or counts[a] >= counts[b] else b
+        self.tree = tree
+
+    def most_movies(self, lo, hi):
+        """
+        Yields the positions in [lo, hi) from most to fewest movies,
+        ties in key order, taking O(log n) steps per position.
+        """
+        tree = self.tree
+        counts = self.counts
+        size = len(tree) // 2
+
+        # Start from the O(log n) nodes covering the range exactly
+        heap = []
+        lo += size
+        hi += size
+        while lo < hi:
+            if lo & 1:
+                heap.append((-counts[tree[lo]], tree[lo], lo))
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                heap.append((-counts[tree[hi]], tree[hi], hi))
+            lo //= 2
+            hi //= 2
+        heapq.heapify(heap)
+
+        while heap:
+            _, i, v = heapq.heappop(heap)
+            if v >= size:
+                yield i
+                continue
+            for child in (2 * v, 2 * v + 1):
+                if tree[child] >= 0:
+                    heapq.heappush(heap, (-counts[tree[child]], tree[child], child))
+
+    def group_births(self):
+        """
+        Returns a dict mapping each birth year to the positions of the
+        people born in it, in key order.
+        """
+        by_birth = {}
+        for i, year in enumerate(self.births):
+            positions = by_birth.get(year)
+            if positions is None:
+                positions = by_birth[year] = array("i")
+            positions.append(i)
+        return by_birth
+
+    def born(self, birth):
+        """
+        Returns the positions of people born in `birth`, in key order.
+        """
+        return self.by_birth.get(str(birth), array("i"))
+
+    def ranked(self, lo, hi, limit, birth=None):
+        """
+        Returns up to `limit` (or all, if None) person IDs at positions
+        [lo, hi), most movies first, keeping only those born in `birth`
+        if given.
+        """
+        if birth is not None:
+            born = self.born(birth)
+            positions = born[bisect_left(born, lo):bisect_left(born, hi)]
+        elif limit is None or hi - lo <= SMALL_RANGE:
+            positions = range(lo, hi)
+        else:
+            return [self.ids[i] for i in itertools.islice(self.most_movies(lo, hi), limit)]
+
+        counts = self.counts
+        if limit is None:
+            best = sorted(positions, key=counts.__getitem__, reverse=True)
+        else:
+            best = heapq.nlargest(limit, positions, key=counts.__getitem__)
+        return [self.ids[i] for i in best]
+
+    def exact(self, name, limit=None, birth=None):
+        """
+        Returns up to `limit` (or all, if None) person IDs named exactly
+        `name` and born in `birth` if given, most movies first.
+        """
+        name = name.lower()
+        lo = bisect_left(self.keys, name)
+        hi = bisect_left(self.keys, name + "\0", lo)
+        return self.ranked(lo, hi, limit, birth)
+
+    def prefix(self, prefix, limit=10, birth=None):
+        """
+        Returns up to `limit` (or all, if None) person IDs whose name
+        starts with `prefix` and born in `birth` if given, most movies
+        first.
+        """
+        prefix = prefix.lower()
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + SENTINEL, lo)
+        return self.ranked(lo, hi, limit, birth)
+
+    def fuzzy(self, name, max_distance=2, limit=10, birth=None):
+        """
+        Returns up to `limit` (or all, if None) person IDs whose name is
+        within `max_distance` edits of `name` and born in `birth` if
+        given, closest and then most movies first.
+
+        The walk visits every trie node within `max_distance` edits of
+        a prefix of `name`, so it costs milliseconds, not microseconds:
+        the slow tier, which person_ids_for_name only runs on request.
+        """
+        name = name.lower()
+        width = len(name)
+        cap = max_distance + 1
+        matches = []
+
+        def walk(keys, base, prefix, lo, hi, row):
+            """
+            Visits the children of the trie node for `prefix`, whose
+            names are keys[lo:hi] (positions base + lo to base + hi) and
+            whose Levenshtein row is `row`.
+            """
+            # Few enough names are copied out once, so that every bisect
+            # below them runs on a plain list
+            if base is None and hi - lo <= LOCAL_RANGE:
+                keys, base = keys[lo:hi], lo
+                lo, hi = 0, hi - lo
+            depth = len(prefix)
+
+            # Names equal to the prefix itself sort first; skip them
+            while lo < hi and len(keys[lo]) == depth:
+                lo += 1
+
+            # Cells further than max_distance off the diagonal can only
+            # exceed it, so only the band around it is computed
+            first = max(1, depth + 1 - max_distance)
+            last = min(width, depth + 1 + max_distance)
+            while lo < hi:
+                c = keys[lo][depth]
+                end = bisect_left(keys, prefix + chr(ord(c) + 1), lo, hi)
+
+                new_row = [cap] * (width + 1)
+                if depth < max_distance:
+                    new_row[0] = depth + 1
+                for i in range(first, last + 1):
+                    cost = row[i - 1] + (name[i - 1] != c)
+                    if new_row[i - 1] + 1 < cost:
+                        cost = new_row[i - 1] + 1
+                    if row[i] + 1 < cost:
+                        cost = row[i] + 1
+                    new_row[i] = cost if cost < cap else cap
+
+                child = prefix + c
+                if new_row[-1] <= max_distance:
+                    i = lo
+                    while i < end and keys[i] == child:
+                        matches.append((new_row[-1], i if base is None else base + i))
+                        i += 1
+                if min(new_row) <= max_distance:
+                    walk(keys, base, child, lo, end, new_row)
+                lo = end
+
+        # Empty names sit at the root, len(name) edits away
+        keys = self.keys
+        if width <= max_distance:
+            i = 0
+            while i < len(keys) and keys[i] == "":
+                matches.append((width, i))
+                i += 1
+        walk(keys, None, "", 0, len(keys), [min(i, cap) for i in range(width + 1)])
+
+        if birth is not None:
+            birth = str(birth)
+            births = self.births
+            matches = [match for match in matches if births[match[1]] == birth]
+
+        counts = self.counts
+
+        def closeness(match):
+            return match[0], -counts[match[1]]
+
+        if limit is None:
+            best = sorted(matches, key=closeness)
+        else:
+            best = heapq.nsmallest(limit, matches, key=closeness)
+        return [self.ids[i] for _, i in best]
@@ -0,0 +1,254 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import degrees
+
+# Latencies kept per endpoint for percentile reporting
+WINDOW = 10_000
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, **details):
+        super().__init__(message)
+        self.status = status
+        self.body = {"error": message, **details}
+
+
+class Service():
+    """
+    Degrees query service over a graph loaded once. Searches run in a
+    forked process pool sharing that graph, so slow paths do not hold up
+    name lookups answered on the event loop.
+    """
+
+    def __init__(self, workers=None, bidirectional=False):
+        self.bidirectional = bidirectional
+        self.pool = ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context("fork")
+        )
+        self.pending = 0
+        self.latencies = {}
+        self.started = time.time()
+
+        # Latest neighbor cache counters reported by each worker process
+        self.caches = {}
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+    async def handle(self, reader, writer):
+        """
+        Serves one HTTP/1.1 request per connection.
+        """
+        start = time.perf_counter()
+        endpoint = None
+        try:
+            request = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            try:
+                method, target, _ = request.decode("latin-1").split()
+            except ValueError:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "malformed request")
+            if method != "GET":
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "only GET is supported")
+
+            url = urlsplit(target)
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            routes = {"/path": self.path, "/person": self.person, "/stats": self.stats}
+            if url.path not in routes:
+                raise HTTPError(HTTPStatus.NOT_FOUND, f"no endpoint {url.path}")
+            endpoint = url.path
+            status, body = HTTPStatus.OK, await routes[endpoint](query)
+        except HTTPError as e:
+            status, body = e.status, e.body
+        except Exception as e:
+            status, body = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)}
+
+        payload = json.dumps(body).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            "Connection: close\r\n\r\n".encode("latin-1") + payload
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+        if endpoint is not None:
+            self.latencies.setdefault(endpoint, deque(maxlen=WINDOW)).append(
+                time.perf_counter() - start)
+
+    def resolve(self, query, field):
+        """
+        Returns the person ID named by query parameter `field`, given
+        either as an ID or as an unambiguous name.
+        """
+        value = query.get(field)
+        if value is None:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"missing parameter {field}")
+        if value in degrees.people:
+            return value
+        person_ids = list(degrees.names.get(value.lower(), ()))
+        if not person_ids:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"no person named {value}")
+        if len(person_ids) > 1:
+            raise HTTPError(HTTPStatus.MULTIPLE_CHOICES, f"{value} is ambiguous",
+                            candidates=[describe(person_id) for person_id in person_ids])
+        return person_ids[0]
+
+    async def path(self, query):
+        source = self.resolve(query, "source")
+        target = self.resolve(query, "target")
+
+        self.pending += 1
+        try:
+            path, worker, cache = await asyncio.get_running_loop().run_in_executor(
+                self.pool, search, source, target, self.bidirectional)
+        finally:
+            self.pending -= 1
+        if cache is not None:
+            self.caches[worker] = cache
+
+        if path is None:
+            return {"source": source, "target": target, "degrees": None, "path": None}
+        return {
+            "source": source,
+            "target": target,
+            "degrees": len(path),
+            "path": [
+                {"movie_id": movie_id, "title": degrees.movies[movie_id]["title"],
+                 "person_id": person_id, "name": degrees.people[person_id]["name"]}
+                for movie_id, person_id in path
+            ]
+        }
+
+    async def person(self, query):
+        name = query.get("name")
+        if name is None:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "missing parameter name")
+        try:
+            limit = int(query.get("limit", 10))
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "limit must be an integer")
+        if limit < 1:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "limit must be at least 1")
+        # Edit-distance matching is the slow tier, so clients opt in
+        fuzzy = query.get("fuzzy", "0").lower() in ("1", "true", "yes")
+        person_ids = degrees.person_ids_for_name(name, query.get("birth"), limit, fuzzy)
+        return {"name": name, "candidates": [describe(p) for p in person_ids]}
+
+    async def stats(self, query):
+        endpoints = {}
+        for endpoint, latencies in self.latencies.items():
+            ordered = sorted(latencies)
+            endpoints[endpoint] = {
+                "count": len(ordered),
+                **{f"p{q}_ms": 1000 * percentile(ordered, q) for q in (50, 90, 99)}
+            }
+        # Each worker caches neighbors separately, so their counters add up
+        cache = None
+        if degrees.neighbor_cache is not None:
+            cache = dict.fromkeys(degrees.neighbor_cache.stats(), 0)
+            for stats in self.caches.values():
+                for key, count in stats.items():
+                    cache[key] += count
+            cache["workers"] = len(self.caches)
+        return {
+            "uptime_s": time.time() - self.started,
+            "queue_depth": self.pending,
+            "latency": endpoints,
+            "neighbor_cache": cache
+        }
+
+
+def search(source, target, bidirectional):
+    """
+    Runs in a worker: returns the shortest path, the worker's process ID
+    and its neighbor cache counters (None if the cache is off).
+    """
+    path = degrees.shortest_path(source, target, bidirectional)
+    cache = degrees.neighbor_cache
+    return path, os.getpid(), None if cache is None else cache.stats()
+
+
+def describe(person_id):
+    """
+    Returns a JSON-ready summary of a person.
+    """
+    person = degrees.people[person_id]
+    return {
+        "id": person_id,
+        "name": person["name"],
+        "birth": person["birth"],
+        "movies": len(person["movies"])
+    }
+
+
+def percentile(ordered, q):
+    """
+    Returns the `q`th percentile of the sorted list `ordered`
+    (nearest-rank), or 0 if it is empty.
+    """
+    if not ordered:
+        return 0
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+async def serve(service, host, port):
+    server = await asyncio.start_server(service.handle, host, port)
+    print(f"Serving on http://{host}:{port}", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve degrees-of-separation queries as JSON over HTTP.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8050)
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="search worker processes (default: CPU count)")
+    parser.add_argument("--dict", action="store_true",
+                        help="use dicts of sets instead of the compact graph store "
+                             "(loads cannot resume)")
+    parser.add_argument("--bidirectional", action="store_true",
+                        help="search from both people towards each other")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="memory-map a compiled snapshot if there is one")
+    parser.add_argument("--cache-entries", type=int, default=100_000,
+                        help="people whose neighbors each worker caches (0 disables)")
+    parser.add_argument("--cache-mb", type=float, default=64,
+                        help="approximate megabytes of neighbors each worker caches")
+    args = parser.parse_args()
+
+    print("Loading data...", file=sys.stderr)
+    degrees.load_data(args.directory, compact=not args.dict, progress=True,
+                      snapshot=args.snapshot)
+    print("Data loaded.", file=sys.stderr)
+    if args.cache_entries > 0:
+        degrees.enable_neighbor_cache(args.cache_entries, int(args.cache_mb * 2 ** 20))
+
+    # Fork the workers only after loading, so they inherit the graph
+    service = Service(args.workers, args.bidirectional)
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
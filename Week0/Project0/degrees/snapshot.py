@@ -0,0 +1,145 @@
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+
+from graph import CompactGraph, NameTable, SortedIndex, StringTable, load_compact
+from ingest import SOURCES, fingerprint
+
+SNAPSHOT = "degrees.snapshot"
+MAGIC = b"DEGSNAP1"
+
+# Sections in file order, with the array typecode each is stored as
+SECTIONS = (
+    ("person_offsets", "q"),
+    ("person_movies", "i"),
+    ("movie_offsets", "q"),
+    ("movie_stars", "i"),
+    ("person_ids.offsets", "q"), ("person_ids.blob", "B"),
+    ("person_names.offsets", "q"), ("person_names.blob", "B"),
+    ("person_births.offsets", "q"), ("person_births.blob", "B"),
+    ("movie_ids.offsets", "q"), ("movie_ids.blob", "B"),
+    ("movie_titles.offsets", "q"), ("movie_titles.blob", "B"),
+    ("movie_years.offsets", "q"), ("movie_years.blob", "B"),
+    ("person_order", "i"),
+    ("movie_order", "i"),
+    ("name_order", "i"),
+)
+
+# Magic, byte order, then (mtime_ns, size) of each source CSV
+HEADER = struct.Struct(f"=8sc{2 * len(SOURCES)}q")
+TABLE = struct.Struct(f"={2 * len(SECTIONS)}q")
+
+
+def compile_snapshot(directory, graph=None, progress=False):
+    """
+    Writes a binary snapshot of the dataset in `directory`, loading it
+    from CSV first unless an already loaded CompactGraph is given.
+    """
+    if graph is None:
+        graph = load_compact(directory, progress)
+
+    tables = {}
+    for field in ("person_ids", "person_names", "person_births",
+                  "movie_ids", "movie_titles", "movie_years"):
+        table = getattr(graph, field)
+        if not isinstance(table, StringTable):
+            table = StringTable.build(table)
+        tables[f"{field}.offsets"] = table.offsets
+        tables[f"{field}.blob"] = table.blob
+
+    people = range(len(graph.person_ids))
+    tables.update(
+        person_offsets=graph.person_offsets,
+        person_movies=graph.person_movies,
+        movie_offsets=graph.movie_offsets,
+        movie_stars=graph.movie_stars,
+        person_order=array("i", sorted(people, key=graph.person_ids.__getitem__)),
+        movie_order=array("i", sorted(range(len(graph.movie_ids)),
+                                      key=graph.movie_ids.__getitem__)),
+        name_order=graph.names.order
+    )
+
+    # Lay sections out after the header, each aligned to 8 bytes
+    layout = []
+    position = HEADER.size + TABLE.size
+    for name, typecode in SECTIONS:
+        data = memoryview(tables[name]).cast("B")
+        position += -position % 8
+        layout += [position, len(data)]
+        position += len(data)
+
+    path = os.path.join(directory, SNAPSHOT)
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(HEADER.pack(MAGIC, sys.byteorder[0].encode(), *fingerprint(directory)))
+        f.write(TABLE.pack(*layout))
+        for (name, typecode), start in zip(SECTIONS, layout[::2]):
+            f.write(bytes(start - f.tell()))
+            f.write(memoryview(tables[name]).cast("B"))
+    os.replace(temporary, path)
+    return path
+
+
+def load_snapshot(directory):
+    """
+    Memory-maps the snapshot in `directory` into a CompactGraph.
+
+    Returns None if there is no snapshot, or if it is stale because
+    a source CSV changed since it was compiled.
+    """
+    path = os.path.join(directory, SNAPSHOT)
+    try:
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):
+        return None
+
+    try:
+        magic, byteorder, *stamp = HEADER.unpack_from(buffer)
+        current = fingerprint(directory)
+    except (struct.error, FileNotFoundError):
+        return None
+    if (magic != MAGIC or byteorder != sys.byteorder[0].encode()
+            or stamp != current):
+        return None
+
+    layout = TABLE.unpack_from(buffer, HEADER.size)
+    view = memoryview(buffer)
+    sections = {}
+    for i, (name, typecode) in enumerate(SECTIONS):
+        start, length = layout[2 * i], layout[2 * i + 1]
+        sections[name] = view[start:start + length].cast(typecode)
+
+    def strings(field):
+        return StringTable(sections[f"{field}.offsets"], sections[f"{field}.blob"])
+
+    person_ids = strings("person_ids")
+    person_names = strings("person_names")
+    movie_ids = strings("movie_ids")
+    return CompactGraph(
+        person_ids, person_names, strings("person_births"),
+        movie_ids, strings("movie_titles"), strings("movie_years"),
+        sections["person_offsets"], sections["person_movies"],
+        sections["movie_offsets"], sections["movie_stars"],
+        SortedIndex(person_ids, sections["person_order"]),
+        SortedIndex(movie_ids, sections["movie_order"]),
+        NameTable(person_names, person_ids, sections["name_order"])
+    )
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python snapshot.py directory")
+    directory = sys.argv[1]
+
+    print("Compiling snapshot...")
+    start = time.perf_counter()
+    path = compile_snapshot(directory, progress=True)
+    print(f"Wrote {path} in {time.perf_counter() - start:.2f}s.")
+
+
+if __name__ == "__main__":
+    main()
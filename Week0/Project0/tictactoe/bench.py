@@ -0,0 +1,210 @@
+"""
+Headless Tic Tac Toe engine benchmark: self-play and perft node counts
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+
+import tictactoe as ttt
+
+# Distinct games from the empty 3x3 board, for checking perft
+KNOWN_GAMES = 255168
+
+
+def parse_position(text):
+    """
+    Returns the board for a row-major string of X, O and . (empty)
+    cells, e.g. "X...O....", whose length must be a square.
+    """
+    marks = {"X": ttt.X, "O": ttt.O, ".": ttt.EMPTY}
+    size = int(len(text) ** 0.5)
+    if size * size != len(text) or set(text.upper()) - set(marks):
+        raise ValueError(f"invalid position {text!r}")
+    cells = [marks[c] for c in text.upper()]
+    return [cells[i * size:(i + 1) * size] for i in range(size)]
+
+
+def perft(rules, x, o, depth, counts, ply=0):
+    """
+    Counts positions reachable from (x, o) within `depth` moves, adding
+    the number at each ply to `counts` and returning the number of
+    finished games found.
+    """
+    counts[ply] += 1
+    if rules.winner(x, o) or (x | o) == rules.full:
+        return 1
+    if ply == depth:
+        return 0
+
+    games = 0
+    x_to_move = rules.x_to_move(x, o)
+    for cell in rules.moves(x, o):
+        bit = 1 << cell
+        if x_to_move:
+            games += perft(rules, x | bit, o, depth, counts, ply + 1)
+        else:
+            games += perft(rules, x, o | bit, depth, counts, ply + 1)
+    return games
+
+
+def run_perft(board, depth):
+    rules = ttt.rules_for(board)
+    x, o = ttt.encode(board)
+    depth = rules.cells - (x | o).bit_count() if depth is None else depth
+    counts = [0] * (depth + 1)
+
+    start = time.perf_counter()
+    games = perft(rules, x, o, depth, counts)
+    elapsed = time.perf_counter() - start
+
+    nodes = sum(counts)
+    return {
+        "depth": depth,
+        "nodes_per_ply": counts,
+        "nodes": nodes,
+        "games": games,
+        "seconds": elapsed,
+        "nodes_per_second": nodes / elapsed if elapsed else None
+    }
+
+
+def self_play(board, games, seed, time_limit):
+    """
+    Plays `games` games of minimax against itself from `board`. On the
+    classic board, each game opens with a random move among the equally
+    good ones so the games differ, and every move minimax picks is
+    checked against all optimal moves.
+
+    Each move is searched with an empty transposition table, so its
+    node count and time do not depend on the searches before it. If
+    the solution table is in use, classic-board moves are read from it
+    instead and no nodes per second are reported.
+    """
+    rng = random.Random(seed)
+    outcomes = {ttt.X: 0, ttt.O: 0, None: 0}
+    move_times = []
+    nodes = 0
+    classic = ttt.rules_for(board) is ttt.RULES
+    table = classic and ttt.solutions() is not None
+    non_optimal = 0 if classic else None
+
+    for _ in range(games):
+        current = board
+        opening = True
+        while not ttt.terminal(current):
+            ttt.transpositions.clear()
+            start = time.perf_counter()
+            action = ttt.minimax(current, time_limit)
+            move_times.append(time.perf_counter() - start)
+            nodes += ttt.stats.get("nodes", 0)
+
+            if classic:
+                optimal = ttt.optimal_actions(current)
+                if action not in optimal:
+                    non_optimal += 1
+                if opening:
+                    action = rng.choice(sorted(optimal))
+            opening = False
+            current = ttt.result(current, action)
+        outcomes[ttt.winner(current)] += 1
+
+    move_times.sort()
+    total = sum(move_times)
+    return {
+        "games": games,
+        "x_wins": outcomes[ttt.X],
+        "o_wins": outcomes[ttt.O],
+        "draws": outcomes[None],
+        "moves": len(move_times),
+        "non_optimal_moves": non_optimal,
+        "mean_move_ms": 1000 * total / len(move_times) if move_times else None,
+        "max_move_ms": 1000 * move_times[-1] if move_times else None,
+        "solution_table": table,
+        "search_nodes": nodes,
+        "nodes_per_second": nodes / total if total and nodes else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--size", type=int, default=3, help="board size")
+    parser.add_argument("--win-length", type=int, default=None,
+                        help="marks in a row needed to win (default: board size)")
+    parser.add_argument("--position", action="append", default=[],
+                        help="row-major start position such as X...O.... (repeatable)")
+    parser.add_argument("--games", type=int, default=100, help="self-play games per position")
+    parser.add_argument("--depth", type=int, default=None,
+                        help="perft depth (default: until the board is full)")
+    parser.add_argument("--no-perft", action="store_true", help="skip the perft count")
+    parser.add_argument("--table", action="store_true",
+                        help="read classic-board self-play moves from solutions.bin "
+                             "instead of searching")
+    parser.add_argument("--time-limit", type=float, default=ttt.TIME_LIMIT,
+                        help="seconds per move on boards larger than 3x3")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    ttt.configure(args.size, args.win_length)
+    if not args.table:
+        ttt.solution_table = False
+    positions = [parse_position(p) for p in args.position] or [ttt.initial_state()]
+
+    results = []
+    ok = True
+    for board in positions:
+        text = "".join("." if c is ttt.EMPTY else c for row in board for c in row)
+        entry = {"position": text}
+        if not args.no_perft:
+            entry["perft"] = run_perft(board, args.depth)
+        if args.games:
+            entry["self_play"] = self_play(board, args.games, args.seed, args.time_limit)
+
+        checks = {}
+        if ttt.rules_for(board) is ttt.RULES:
+            play = entry.get("self_play")
+            if play is not None:
+                checks["minimax_optimal"] = play["non_optimal_moves"] == 0
+
+            # Perfect play from the empty classic board must always draw
+            if text == "." * 9:
+                if "perft" in entry and args.depth is None:
+                    checks["perft_games"] = entry["perft"]["games"] == KNOWN_GAMES
+                if play is not None:
+                    checks["all_draws"] = play["draws"] == play["games"]
+        if checks:
+            entry["checks"] = checks
+            ok = ok and all(checks.values())
+        results.append(entry)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for entry in results:
+            print(f"Position {entry['position']}")
+            if "perft" in entry:
+                p = entry["perft"]
+                print(f"  perft({p['depth']}): {p['nodes']:,} nodes, {p['games']:,} games, "
+                      f"{p['seconds']:.3f}s ({p['nodes_per_second'] or 0:,.0f} nodes/s)")
+                print(f"    per ply: {p['nodes_per_ply']}")
+            if "self_play" in entry:
+                s = entry["self_play"]
+                if s["solution_table"]:
+                    searched = "moves from solutions.bin"
+                else:
+                    searched = (f"{s['search_nodes']:,} nodes "
+                                f"({s['nodes_per_second'] or 0:,.0f} nodes/s)")
+                print(f"  self-play: {s['games']} games, X {s['x_wins']} / O {s['o_wins']} "
+                      f"/ draw {s['draws']}, {s['moves']} moves, {searched}, "
+                      f"mean {s['mean_move_ms'] or 0:.3f} ms, max {s['max_move_ms'] or 0:.3f} ms per move")
+            for check, passed in entry.get("checks", {}).items():
+                print(f"  check {check}: {'ok' if passed else 'FAILED'}")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Bitboard representation of Tic Tac Toe positions
+"""
+
+
+class Rules():
+    """
+    Precomputed masks for a `size` x `size` board won by `length` marks
+    in a row. Cell (i, j) is bit i * size + j, and a position is a pair
+    of masks (x, o) holding each player's marks.
+    """
+
+    def __init__(self, size=3, length=3):
+        self.size = size
+        self.length = length
+        self.cells = size * size
+        self.full = (1 << self.cells) - 1
+        self.lines = self.win_lines()
+        self.symmetries = self.symmetry_maps()
+
+        # Per-symmetry lookup of every mask's image, affordable on small boards
+        if self.cells <= 12:
+            self.images = [
+                [self.permute(mask, mapping) for mask in range(self.full + 1)]
+                for mapping in self.symmetries
+            ]
+        else:
+            self.images = None
+
+    def win_lines(self):
+        """
+        Returns a mask for every run of `length` cells in a row, column
+        or diagonal.
+        """
+        size, length = self.size, self.length
+        lines = []
+        for i in range(size):
+            for j in range(size):
+                for di, dj in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    end_i, end_j = i + di * (length - 1), j + dj * (length - 1)
+                    if not (0 <= end_i < size and 0 <= end_j < size):
+                        continue
+                    mask = 0
+                    for k in range(length):
+                        mask |= 1 << ((i + di * k) * size + j + dj * k)
+                    lines.append(mask)
+        return tuple(lines)
+
+    def symmetry_maps(self):
+        """
+        Returns the 8 rotations/reflections of the board, each as a tuple
+        giving the destination bit of every source bit.
+        """
+        size = self.size
+        maps = []
+        for reflected in (False, True):
+            for turns in range(4):
+                mapping = []
+                for i in range(size):
+                    for j in range(size):
+                        cell = (i, size - 1 - j) if reflected else (i, j)
+                        for _ in range(turns):
+                            cell = (cell[1], size - 1 - cell[0])
+                        mapping.append(cell[0] * size + cell[1])
+                maps.append(tuple(mapping))
+        return maps
+
+    @staticmethod
+    def permute(mask, mapping):
+        image = 0
+        source = 0
+        while mask:
+            if mask & 1:
+                image |= 1 << mapping[source]
+            mask >>= 1
+            source += 1
+        return image
+
+    def canonical(self, x, o):
+        """
+        Returns a key shared by a position and all of its rotations and
+        reflections.
+        """
+        cells = self.cells
+        if self.images is not None:
+            return min((image[x] << cells) | image[o] for image in self.images)
+        return min(
+            (self.permute(x, mapping) << cells) | self.permute(o, mapping)
+            for mapping in self.symmetries
+        )
+
+    def from_board(self, board, x_mark, o_mark):
+        """
+        Returns the (x, o) masks of a list-of-lists board.
+        """
+        x = o = 0
+        bit = 1
+        for row in board:
+            for cell in row:
+                if cell == x_mark:
+                    x |= bit
+                elif cell == o_mark:
+                    o |= bit
+                bit <<= 1
+        return x, o
+
+    def to_board(self, x, o, x_mark, o_mark, empty):
+        """
+        Returns the list-of-lists board for masks (x, o).
+        """
+        size = self.size
+        return [
+            [x_mark if x >> (i * size + j) & 1
+             else o_mark if o >> (i * size + j) & 1
+             else empty
+             for j in range(size)]
+            for i in range(size)
+        ]
+
+    @staticmethod
+    def x_to_move(x, o):
+        return x.bit_count() <= o.bit_count()
+
+    def moves(self, x, o):
+        """
+        Returns the indices of the empty cells.
+        """
+        empty = self.full & ~(x | o)
+        moves = []
+        while empty:
+            low = empty & -empty
+            moves.append(low.bit_length() - 1)
+            empty ^= low
+        return moves
+
+    def wins(self, mask):
+        for line in self.lines:
+            if mask & line == line:
+                return True
+        return False
+
+    def winner(self, x, o):
+        """
+        Returns 1 if X has a line, -1 if O has, 0 otherwise.
+        """
+        if self.wins(x):
+            return 1
+        if self.wins(o):
+            return -1
+        return 0
@@ -4,6 +4,10 @@ import time
 
 import tictactoe as ttt
 
+# Optional board size and win length: python runner.py [size] [win_length]
+if len(sys.argv) > 1:
+    ttt.configure(*(int(arg) for arg in sys.argv[1:3]))
+
 pygame.init()
 size = width, height = 600, 400
 
@@ -15,7 +19,10 @@ screen = pygame.display.set_mode(size)
 
 mediumFont = pygame.font.Font("OpenSans-Regular.ttf", 28)
 largeFont = pygame.font.Font("OpenSans-Regular.ttf", 40)
-moveFont = pygame.font.Font("OpenSans-Regular.ttf", 60)
+
+# Shrink tiles on larger boards so the grid still fits the window
+tile_size = min(80, 240 // ttt.BOARD_SIZE)
+moveFont = pygame.font.Font("OpenSans-Regular.ttf", tile_size * 3 // 4)
 
 user = None
 board = ttt.initial_state()
@@ -67,13 +74,12 @@ while True:
     else:
 
         # Draw game board
-        tile_size = 80
-        tile_origin = (width / 2 - (1.5 * tile_size),
-                       height / 2 - (1.5 * tile_size))
+        tile_origin = (width / 2 - (ttt.BOARD_SIZE / 2 * tile_size),
+                       height / 2 - (ttt.BOARD_SIZE / 2 * tile_size))
         tiles = []
-        for i in range(3):
+        for i in range(ttt.BOARD_SIZE):
             row = []
-            for j in range(3):
+            for j in range(ttt.BOARD_SIZE):
                 rect = pygame.Rect(
                     tile_origin[0] + j * tile_size,
                     tile_origin[1] + i * tile_size,
@@ -122,8 +128,8 @@ while True:
         click, _, _ = pygame.mouse.get_pressed()
         if click == 1 and user == player and not game_over:
             mouse = pygame.mouse.get_pos()
-            for i in range(3):
-                for j in range(3):
+            for i in range(ttt.BOARD_SIZE):
+                for j in range(ttt.BOARD_SIZE):
                     if (board[i][j] == ttt.EMPTY and tiles[i][j].collidepoint(mouse)):
                         board = ttt.result(board, (i, j))
 
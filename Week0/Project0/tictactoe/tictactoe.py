@@ -3,11 +3,19 @@ Tic Tac Toe Player
 """
 
 import math
+import os
+import time
+
+from bitboard import Rules
 
 X = "X"
 O = "O"
 EMPTY = None
 BOARD_SIZE = 3
+WIN_LENGTH = 3
+
+# Seconds minimax may think on boards too large to solve exactly
+TIME_LIMIT = 0.2
 
 
 class InvalidActionError(Exception):
@@ -15,14 +23,27 @@ class InvalidActionError(Exception):
         super().__init__("Invalid action")
 
 
-def initial_state():
+def configure(size, win_length=None):
+    """
+    Sets the board size of new games and the number of marks in a row
+    needed to win (the full board width by default).
+    """
+
+    global BOARD_SIZE, WIN_LENGTH
+    if win_length is None:
+        win_length = size
+    if not 1 <= win_length <= size:
+        raise ValueError("win length must be between 1 and the board size")
+    BOARD_SIZE, WIN_LENGTH = size, win_length
+
+
+def initial_state(size=None):
     """
     Returns starting state of the board.
     """
 
-    return [[EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY]]
+    size = BOARD_SIZE if size is None else size
+    return [[EMPTY] * size for _ in range(size)]
 
 
 def player(board):
@@ -30,10 +51,8 @@ def player(board):
     Returns player who has the next turn on a board.
     """
 
-    o_count = sum([row.count(O) for row in board])
-    x_count = sum([row.count(X) for row in board])
-
-    return X if o_count >= x_count else O
+    x, o = encode(board)
+    return X if Rules.x_to_move(x, o) else O
 
 
 def actions(board):
@@ -41,13 +60,9 @@ def actions(board):
     Returns set of all possible actions (i, j) available on the board.
     """
 
-    possible = set()
-    for i in range(BOARD_SIZE):
-        for j in range(BOARD_SIZE):
-            if board[i][j] == EMPTY:
-                possible.add((i, j))
-
-    return possible
+    rules = rules_for(board)
+    x, o = encode(board)
+    return {divmod(cell, rules.size) for cell in rules.moves(x, o)}
 
 
 def result(board, action):
@@ -55,11 +70,17 @@ def result(board, action):
     Returns the board that results from making move (i, j) on the board.
     """
 
-    if action not in actions(board):
+    size = len(board)
+    x, o = encode(board)
+    i, j = action
+    if not (0 <= i < size and 0 <= j < size):
+        raise InvalidActionError
+    bit = 1 << (i * size + j)
+    if (x | o) & bit:
         raise InvalidActionError
 
     new_board = [row.copy() for row in board]
-    new_board[action[0]][action[1]] = player(board)
+    new_board[i][j] = X if Rules.x_to_move(x, o) else O
 
     return new_board
 
@@ -69,23 +90,7 @@ def winner(board):
     Returns the winner of the game, if there is one.
     """
 
-    def check(option, player):
-        for cell in option:
-            if cell != player:
-                return False
-
-        return True
-
-    possible = [row for row in board] + [list(col) for col in zip(*board)]
-    possible += [[board[i][i]
-                 for i in range(BOARD_SIZE)]] + [[board[i][BOARD_SIZE-1-i] for i in range(BOARD_SIZE)]]
-
-    for player in (X, O):
-        for option in possible:
-            if check(option, player):
-                return player
-
-    return None
+    return WINNERS[rules_for(board).winner(*encode(board))]
 
 
 def terminal(board):
@@ -93,11 +98,9 @@ def terminal(board):
     Returns True if game is over, False otherwise.
     """
 
-    empty_count = sum([row.count(EMPTY) for row in board])
-    if empty_count != 0:
-        return winner(board) is not None
-
-    return True
+    rules = rules_for(board)
+    x, o = encode(board)
+    return (x | o) == rules.full or rules.winner(x, o) != 0
 
 
 def utility(board):
@@ -105,56 +108,358 @@ def utility(board):
     Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
     """
 
-    result = winner(board)
+    return rules_for(board).winner(*encode(board))
+
+
+def encode(board):
+    """
+    Returns the (x, o) bitboard masks of a board.
+    """
+
+    return rules_for(board).from_board(board, X, O)
 
-    if result == X:
-        return 1
-    elif result == O:
-        return -1
-    else:
-        return 0
 
+# Rules for each (size, win length) seen so far
+rules_cache = {}
 
-def minimax(board):
+
+def rules_for(board):
     """
-    Returns the optimal action for the current player on the board.
+    Returns the Rules for the board's size, won by WIN_LENGTH in a row
+    (or the full width, on boards narrower than that).
     """
 
-    def minimize(board):
-        v = math.inf
-        if terminal(board):
-            return utility(board), None
+    key = (len(board), min(WIN_LENGTH, len(board)))
+    if key not in rules_cache:
+        rules_cache[key] = Rules(*key)
+    return rules_cache[key]
 
-        for action in actions(board):
-            new_val, _ = maximize(result(board, action))
-            if new_val < v:
-                v = new_val
-                picked = action
 
-                if v == -1:
-                    return v, picked
+# The classic game, solved exactly by value() and the solution table
+RULES = rules_cache[3, 3] = Rules(3, 3)
+WINNERS = {1: X, -1: O, 0: None}
 
-        return v, picked
+# Maps canonical position keys to (lower, upper) bounds on their minimax value
+transpositions = {}
 
-    def maximize(board):
+# Counters for the most recent minimax call
+stats = {"nodes": 0, "hits": 0}
+
+
+def value(x, o, alpha=-math.inf, beta=math.inf):
+    """
+    Returns the minimax value of the bitboard position (x, o) using
+    alpha-beta search, sharing results between symmetric positions via
+    the transposition table.
+    """
+    stats["nodes"] += 1
+    outcome = RULES.winner(x, o)
+    if outcome or (x | o) == RULES.full:
+        return outcome
+
+    key = RULES.canonical(x, o)
+    lower, upper = transpositions.get(key, (-math.inf, math.inf))
+    if lower >= beta or lower == upper:
+        stats["hits"] += 1
+        return lower
+    if upper <= alpha:
+        stats["hits"] += 1
+        return upper
+    alpha, beta = max(alpha, lower), min(beta, upper)
+
+    window = alpha, beta
+    if RULES.x_to_move(x, o):
         v = -math.inf
-        if terminal(board):
-            return utility(board), None
+        for cell in RULES.moves(x, o):
+            v = max(v, value(x | 1 << cell, o, alpha, beta))
+            alpha = max(alpha, v)
+            if alpha >= beta:
+                break
+    else:
+        v = math.inf
+        for cell in RULES.moves(x, o):
+            v = min(v, value(x, o | 1 << cell, alpha, beta))
+            beta = min(beta, v)
+            if alpha >= beta:
+                break
+
+    # A value outside the window is only a bound on the true value
+    if v <= window[0]:
+        upper = min(upper, v)
+    elif v >= window[1]:
+        lower = max(lower, v)
+    else:
+        lower = upper = v
+    transpositions[key] = (lower, upper)
+    return v
 
-        for action in actions(board):
-            new_val, _ = minimize(result(board, action))
-            if new_val > v:
-                v = new_val
-                picked = action
 
-                if v == 1:
-                    return v, picked
+# Solution table: one byte per base-3 position index holding
+# (value + 1) << 4 | best cell, with NO_MOVE for terminal positions
+# and UNREACHABLE for positions that cannot arise in play
+SOLUTIONS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "solutions.bin")
+NO_MOVE = 0x0F
+UNREACHABLE = 0xFF
 
-        return v, picked
+# Base-3 weight of every mask's cells, for indexing the solution table
+TERNARY = [sum(3 ** i for i in range(RULES.cells) if mask >> i & 1)
+           for mask in range(RULES.full + 1)]
 
-    if player(board) == X:
-        _, picked = maximize(board)
-    else:
-        _, picked = minimize(board)
+# Loaded lazily by solutions(); False if unavailable
+solution_table = None
+
+
+def solutions():
+    """
+    Returns the solution table, loading it on first use, or None if the
+    file is missing or does not match the board.
+    """
+    global solution_table
+    if solution_table is None:
+        try:
+            with open(SOLUTIONS_FILE, "rb") as f:
+                data = f.read()
+        except OSError:
+            data = b""
+        solution_table = data if len(data) == 3 ** RULES.cells else False
+    return solution_table or None
+
+
+def build_solutions(path=SOLUTIONS_FILE):
+    """
+    Solves every position reachable from the empty board and writes the
+    solution table to `path`.
+    """
+    table = bytearray([UNREACHABLE]) * 3 ** RULES.cells
+
+    def solve(x, o):
+        index = TERNARY[x] + 2 * TERNARY[o]
+        if table[index] != UNREACHABLE:
+            return
+        outcome = RULES.winner(x, o)
+        if outcome or (x | o) == RULES.full:
+            table[index] = (outcome + 1) << 4 | NO_MOVE
+            return
+
+        target = value(x, o)
+        best = None
+        for cell in RULES.moves(x, o):
+            bit = 1 << cell
+            child = (x | bit, o) if RULES.x_to_move(x, o) else (x, o | bit)
+            if best is None and value(*child) == target:
+                best = cell
+            solve(*child)
+        table[index] = (target + 1) << 4 | best
+
+    solve(0, 0)
+    with open(path, "wb") as f:
+        f.write(table)
+    return sum(entry != UNREACHABLE for entry in table)
+
+
+def minimax(board, time_limit=TIME_LIMIT):
+    """
+    Returns the optimal action for the current player on the board.
+
+    On the classic 3x3 board, reachable positions are answered from the
+    solution table and anything else by exact search. Larger games use
+    iterative deepening within `time_limit` seconds, so their action is
+    the best found in time. The number of positions searched (and table
+    hits, or depth reached) are left in `stats`.
+    """
+    stats.clear()
+    stats["nodes"] = stats["hits"] = 0
+    rules = rules_for(board)
+    x, o = encode(board)
+    if rules.winner(x, o) or (x | o) == rules.full:
+        return None
+
+    if rules is not RULES:
+        search = Search(rules, time_limit)
+        me, them = (x, o) if rules.x_to_move(x, o) else (o, x)
+        cell = search.best_action(me, them)
+        stats.update(nodes=search.nodes, depth=search.depth)
+        return divmod(cell, rules.size)
+
+    table = solutions()
+    if table is not None:
+        entry = table[TERNARY[x] + 2 * TERNARY[o]]
+        if entry != UNREACHABLE:
+            return divmod(entry & 0x0F, RULES.size)
+
+    maximizing = RULES.x_to_move(x, o)
+    picked = None
+    alpha, beta = -math.inf, math.inf
+    for cell in RULES.moves(x, o):
+        bit = 1 << cell
+        if maximizing:
+            v = value(x | bit, o, alpha, beta)
+        else:
+            v = value(x, o | bit, alpha, beta)
+        if maximizing and v > alpha:
+            alpha, picked = v, divmod(cell, RULES.size)
+        elif not maximizing and v < beta:
+            beta, picked = v, divmod(cell, RULES.size)
+        if alpha >= 1 or beta <= -1:
+            break
 
     return picked
+
+
+def optimal_actions(board):
+    """
+    Returns the set of all actions that keep the minimax value of a
+    classic 3x3 board. Larger boards are not solved exactly, so there
+    it is just the action minimax picks.
+    """
+    rules = rules_for(board)
+    x, o = encode(board)
+    if rules.winner(x, o) or (x | o) == rules.full:
+        return set()
+    if rules is not RULES:
+        return {minimax(board)}
+
+    target = value(x, o)
+    optimal = set()
+    for cell in RULES.moves(x, o):
+        bit = 1 << cell
+        child = (x | bit, o) if RULES.x_to_move(x, o) else (x, o | bit)
+        if value(*child) == target:
+            optimal.add(divmod(cell, RULES.size))
+    return optimal
+
+
+class Timeout(Exception):
+    pass
+
+
+class Search():
+    """
+    Iterative-deepening alpha-beta (negamax) search for games too large
+    to solve exactly. Positions are seen from the side to move as
+    masks (me, them); unfinished positions at the depth limit are scored
+    heuristically, and deeper iterations are abandoned at the deadline.
+    """
+
+    # Score of a win, reduced by the moves taken to reach it
+    WIN = 1_000_000
+
+    EXACT, LOWER, UPPER = range(3)
+
+    def __init__(self, rules, time_limit):
+        self.rules = rules
+        self.deadline = time.perf_counter() + time_limit
+        self.nodes = 0
+        self.depth = 0
+
+        # Maps (me, them) to (depth, score, flag, best cell)
+        self.table = {}
+
+        # Cutoff counts per cell, and the static number of lines through it
+        self.history = [0] * rules.cells
+        self.centrality = [sum(line >> cell & 1 for line in rules.lines)
+                           for cell in range(rules.cells)]
+
+        # Score of an unblocked line holding n of one player's marks
+        self.weights = [0] + [4 ** n for n in range(rules.length)]
+
+    def evaluate(self, me, them):
+        """
+        Scores a position for the side to move by its open lines.
+        """
+        weights = self.weights
+        score = 0
+        for line in self.rules.lines:
+            mine, theirs = me & line, them & line
+            if not theirs:
+                score += weights[mine.bit_count()]
+            elif not mine:
+                score -= weights[theirs.bit_count()]
+        return score
+
+    def ordered(self, me, them, first):
+        """
+        Returns the empty cells, best guess first: the table's move, then
+        by cutoff history and centrality.
+        """
+        history, centrality = self.history, self.centrality
+        moves = sorted(self.rules.moves(me, them),
+                       key=lambda cell: (history[cell], centrality[cell]),
+                       reverse=True)
+        if first is not None:
+            moves.remove(first)
+            moves.insert(0, first)
+        return moves
+
+    def negamax(self, me, them, depth, alpha, beta, ply):
+        self.nodes += 1
+        if not self.nodes & 255 and time.perf_counter() > self.deadline:
+            raise Timeout
+
+        rules = self.rules
+        if rules.wins(them):
+            return -(self.WIN - ply)
+        if (me | them) == rules.full:
+            return 0
+        if depth == 0:
+            return self.evaluate(me, them)
+
+        key = (me, them)
+        best_move = None
+        entry = self.table.get(key)
+        if entry is not None:
+            stored_depth, score, flag, best_move = entry
+            if stored_depth >= depth:
+                if flag == self.EXACT:
+                    return score
+                if flag == self.LOWER:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        original_alpha = alpha
+        best = -math.inf
+        for cell in self.ordered(me, them, best_move):
+            score = -self.negamax(them, me | 1 << cell, depth - 1, -beta, -alpha, ply + 1)
+            if score > best:
+                best, best_move = score, cell
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                self.history[cell] += depth * depth
+                break
+
+        if best <= original_alpha:
+            flag = self.UPPER
+        elif best >= beta:
+            flag = self.LOWER
+        else:
+            flag = self.EXACT
+        self.table[key] = (depth, best, flag, best_move)
+        return best
+
+    def best_action(self, me, them):
+        """
+        Returns the cell chosen by the deepest search completed in time.
+        """
+        rules = self.rules
+        remaining = rules.cells - (me | them).bit_count()
+        best = self.ordered(me, them, None)[0]
+        for depth in range(1, remaining + 1):
+            try:
+                score = self.negamax(me, them, depth, -math.inf, math.inf, 0)
+            except Timeout:
+                break
+            best = self.table[me, them][3]
+            self.depth = depth
+
+            # A forced result will not change with more depth
+            if abs(score) >= self.WIN - rules.cells:
+                break
+        return best
+
+
+if __name__ == "__main__":
+    positions = build_solutions()
+    print(f"Solved {positions} positions into {SOLUTIONS_FILE}.")
@@ -0,0 +1,197 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+from logic import (And, Biconditional, Implication, KnowledgeBase, Not, Or, Symbol,
+                   bitset_check, model_check, model_check_batch, parallel_model_check)
+from sat import entails, entails_all
+
+NAMES = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def character(i):
+    """Returns the name of the ith character: A to Z, then A1 to Z1..."""
+    return NAMES[i % 26] + (str(i // 26) if i >= 26 else "")
+
+
+def statement(rng, knights, knaves, depth):
+    """Returns a random claim about the characters' kinds."""
+    count = len(knights)
+    kind = rng.random()
+    if depth == 0 or kind < 0.35:
+        i = rng.randrange(count)
+        return knights[i] if rng.random() < 0.5 else knaves[i]
+    if kind < 0.5:
+        # "X and Y are of the same kind"
+        i, j = rng.sample(range(count), 2) if count > 1 else (0, 0)
+        return Biconditional(knights[i], knights[j])
+    if kind < 0.6:
+        return Not(statement(rng, knights, knaves, depth - 1))
+    if kind < 0.75:
+        return And(*[statement(rng, knights, knaves, depth - 1) for _ in range(rng.randint(2, 3))])
+    if kind < 0.9:
+        return Or(*[statement(rng, knights, knaves, depth - 1) for _ in range(rng.randint(2, 3))])
+    return Implication(statement(rng, knights, knaves, depth - 1),
+                       statement(rng, knights, knaves, depth - 1))
+
+
+def generate(characters, statements, seed=0, depth=2):
+    """
+    Returns a random knights and knaves puzzle as (knowledge, queries,
+    solution).
+
+    Each character is secretly a knight or a knave. Each statement is
+    made by a random character and is true exactly when its speaker is a
+    knight, so the hidden assignment always satisfies the knowledge.
+    queries holds every "X is a Knight" and "X is a Knave" symbol, and
+    solution maps each character to True for a knight.
+    """
+    rng = random.Random(seed)
+    names = [character(i) for i in range(characters)]
+    knights = [Symbol(f"{name} is a Knight") for name in names]
+    knaves = [Symbol(f"{name} is a Knave") for name in names]
+    solution = {name: rng.random() < 0.5 for name in names}
+    model = {}
+    for name, knight, knave in zip(names, knights, knaves):
+        model[knight.name] = solution[name]
+        model[knave.name] = not solution[name]
+
+    clauses = []
+    for knight, knave in zip(knights, knaves):
+        clauses.append(Or(knight, knave))
+        clauses.append(Not(And(knight, knave)))
+
+    for _ in range(statements):
+        speaker = rng.randrange(characters)
+        claim = statement(rng, knights, knaves, depth)
+        if claim.evaluate(model) != solution[names[speaker]]:
+            claim = Not(claim)
+        clauses.append(Implication(knights[speaker], claim))
+        clauses.append(Implication(knaves[speaker], Not(claim)))
+    knowledge = And(*clauses)
+
+    queries = [symbol for pair in zip(knights, knaves) for symbol in pair]
+    return knowledge, queries, solution
+
+
+def ask_each(check):
+    def engine(knowledge, queries):
+        return [check(knowledge, query) for query in queries]
+    return engine
+
+
+def knowledge_base(knowledge, queries):
+    kb = KnowledgeBase()
+    for sentence in knowledge.conjuncts:
+        kb.tell(sentence)
+    return [kb.ask(query) for query in queries]
+
+
+# Engines answering every query of a puzzle, and the most symbols each
+# is run on by default; None means no limit
+ENGINES = {
+    "model_check": (ask_each(model_check), 20),
+    "parallel_model_check": (ask_each(parallel_model_check), 24),
+    "bitset_check": (ask_each(bitset_check), 24),
+    "model_check_batch": (model_check_batch, 24),
+    "knowledge_base": (knowledge_base, 24),
+    "entails": (ask_each(entails), None),
+    "entails_all": (entails_all, None)
+}
+
+
+def measure(engine, puzzles):
+    """
+    Times `engine` on each puzzle, returning the mean and maximum
+    seconds and the answers it gave.
+    """
+    times = []
+    answers = []
+    for knowledge, queries, _ in puzzles:
+        start = time.perf_counter()
+        answers.append(engine(knowledge, queries))
+        times.append(time.perf_counter() - start)
+    return {"mean_s": sum(times) / len(times), "max_s": max(times)}, answers
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark logic engines on random knights and knaves puzzles.")
+    parser.add_argument("--characters", type=int, nargs="+", default=[2, 4, 6, 8, 10, 12],
+                        help="puzzle sizes to benchmark (default: 2 4 6 8 10 12)")
+    parser.add_argument("--statements", type=float, default=1.5,
+                        help="statements per character (default: 1.5)")
+    parser.add_argument("--depth", type=int, default=2, help="nesting depth of statements")
+    parser.add_argument("--puzzles", type=int, default=5, help="puzzles per size")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES))
+    parser.add_argument("--max-symbols", type=int, default=None,
+                        help="run every engine up to this many symbols, overriding its default limit")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default="-",
+                        help="file to write JSON results to (default: stdout)")
+    args = parser.parse_args()
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "puzzles": args.puzzles,
+        "runs": []
+    }
+    previous = {}
+    for characters in args.characters:
+        statements = max(1, round(args.statements * characters))
+        puzzles = [
+            generate(characters, statements, args.seed + i, args.depth)
+            for i in range(args.puzzles)
+        ]
+        symbols = 2 * characters
+        print(f"{characters} characters, {statements} statements, {symbols} symbols",
+              file=sys.stderr)
+
+        reference = None
+        for name in args.engines:
+            engine, limit = ENGINES[name]
+            limit = args.max_symbols if args.max_symbols is not None else limit
+            if limit is not None and symbols > limit:
+                continue
+            timing, answers = measure(engine, puzzles)
+
+            # Every engine must agree, and entail each character's true kind
+            if reference is None:
+                reference = answers
+                solved = [
+                    all(answer[2 * i + (not solution[character(i)])]
+                        for i in range(characters))
+                    for (_, _, solution), answer in zip(puzzles, answers)
+                ]
+            run = {
+                "engine": name,
+                "characters": characters,
+                "statements": statements,
+                "symbols": symbols,
+                **timing,
+                # Growth in mean time since the previous size
+                "growth": timing["mean_s"] / previous[name] if previous.get(name) else None,
+                "agrees": answers == reference,
+                "fully_determined": sum(solved)
+            }
+            previous[name] = timing["mean_s"]
+            report["runs"].append(run)
+            growth = f"  x{run['growth']:.1f}" if run["growth"] else ""
+            print(f"  {name:22} {1000 * timing['mean_s']:10.2f} ms{growth}"
+                  f"{'' if run['agrees'] else '  DISAGREES'}", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,95 @@
 import itertools
+import multiprocessing
+import os
+import weakref
+
+# Loop iterations between checks for a cancelled parallel_model_check
+CHECK_STOP_EVERY = 1024
 
 
 class Sentence():
+    __slots__ = ("__weakref__", "_summary")
+
+    # Live sentences keyed by class and the identities of their parts,
+    # so structurally equal ones are one node; And and Or have their own
+    interned = weakref.WeakValueDictionary()
+
+    def __new__(cls, *args):
+        self = super().__new__(cls)
+        self._summary = None
+        return self
 
     def evaluate(self, model):
         """Evaluates the logical sentence."""
         raise Exception("nothing to evaluate")
 
+    def evaluate_partial(self, model):
+        """Evaluates the sentence in a model that may leave symbols out.
+
+        Returns True or False if the assigned symbols decide the value,
+        and None if it depends on the missing ones.
+        """
+        raise Exception("nothing to evaluate")
+
     def formula(self):
         """Returns string formula representing logical sentence."""
         return ""
 
     def symbols(self):
         """Returns a set of all symbols in the logical sentence."""
-        return set()
+        return set(self.cached()[1])
+
+    def parts(self):
+        """Returns the sentences this sentence is made of."""
+        return ()
+
+    def cached(self):
+        """Returns the sentence's hash and frozenset of symbols."""
+        summary = self._summary
+        if summary is None:
+            summary = self.summarize(tuple([part.cached() for part in self.parts()]))
+            self._summary = summary
+        return summary
+
+    def summarize(self, inputs):
+        """Computes the hash and frozenset of symbols from the parts' pairs."""
+        return object.__hash__(self), frozenset()
 
     @classmethod
     def validate(cls, sentence):
         if not isinstance(sentence, Sentence):
             raise TypeError("must be a logical sentence")
 
+    @classmethod
+    def intern(cls, key, create):
+        """Returns the live sentence stored under key, or a new one from create().
+
+        Structurally equal sentences built from the same children are
+        thus one shared node.
+        """
+        self = cls.interned.get(key)
+        if self is None:
+            self = create()
+            cls.interned[key] = self
+        return self
+
+    @classmethod
+    def intern_parts(cls, parts):
+        """Returns the live And or Or over the tuple parts, or a new one.
+
+        Their tables are keyed by the parts tuple itself, which the node
+        also stores, so interning them allocates no separate key.
+        """
+        self = cls.interned.get(parts)
+        if self is None:
+            for part in parts:
+                if not isinstance(part, Sentence):
+                    raise TypeError("must be a logical sentence")
+            self = super(cls, cls).__new__(cls)
+            self._parts = parts
+            cls.interned[parts] = self
+        return self
+
     @classmethod
     def parenthesize(cls, s):
         """Parenthesizes an expression if not already parenthesized."""
@@ -43,15 +113,25 @@ class Sentence():
 
 
 class Symbol(Sentence):
+    __slots__ = ("name",)
 
-    def __init__(self, name):
-        self.name = name
+    def __new__(cls, name):
+        def create():
+            self = super(Symbol, cls).__new__(cls)
+            self.name = name
+            return self
+        return Sentence.intern((cls, name), create)
 
     def __eq__(self, other):
-        return isinstance(other, Symbol) and self.name == other.name
+        return self is other or (
+            isinstance(other, Symbol) and self.name == other.name
+        )
 
     def __hash__(self):
-        return hash(("symbol", self.name))
+        return self.cached()[0]
+
+    def __reduce__(self):
+        return type(self), (self.name,)
 
     def __repr__(self):
         return self.name
@@ -62,23 +142,40 @@ class Symbol(Sentence):
         except KeyError:
             raise Exception(f"variable {self.name} not in model")
 
+    def evaluate_partial(self, model):
+        value = model.get(self.name)
+        return None if value is None else bool(value)
+
     def formula(self):
         return self.name
 
-    def symbols(self):
-        return {self.name}
+    def summarize(self, inputs):
+        return hash(("symbol", self.name)), frozenset((self.name,))
 
 
 class Not(Sentence):
-    def __init__(self, operand):
+    __slots__ = ("operand",)
+
+    def __new__(cls, operand):
         Sentence.validate(operand)
-        self.operand = operand
+
+        def create():
+            self = super(Not, cls).__new__(cls)
+            self.operand = operand
+            return self
+        return Sentence.intern((cls, id(operand)), create)
 
     def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
+        return self is other or (
+            isinstance(other, Not) and hash(self) == hash(other)
+            and self.operand == other.operand
+        )
 
     def __hash__(self):
-        return hash(("not", hash(self.operand)))
+        return self.cached()[0]
+
+    def __reduce__(self):
+        return type(self), (self.operand,)
 
     def __repr__(self):
         return f"Not({self.operand})"
@@ -86,26 +183,43 @@ class Not(Sentence):
     def evaluate(self, model):
         return not self.operand.evaluate(model)
 
+    def evaluate_partial(self, model):
+        value = self.operand.evaluate_partial(model)
+        return None if value is None else not value
+
     def formula(self):
         return "¬" + Sentence.parenthesize(self.operand.formula())
 
-    def symbols(self):
-        return self.operand.symbols()
+    def parts(self):
+        return (self.operand,)
+
+    def summarize(self, inputs):
+        (operand_hash, symbols), = inputs
+        return hash(("not", operand_hash)), symbols
 
 
 class And(Sentence):
-    def __init__(self, *conjuncts):
-        for conjunct in conjuncts:
-            Sentence.validate(conjunct)
-        self.conjuncts = list(conjuncts)
+    __slots__ = ("_parts",)
+    interned = weakref.WeakValueDictionary()
+
+    def __new__(cls, *conjuncts):
+        return cls.intern_parts(conjuncts)
+
+    @property
+    def conjuncts(self):
+        return self._parts
 
     def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
+        return self is other or (
+            isinstance(other, And) and hash(self) == hash(other)
+            and self.conjuncts == other.conjuncts
+        )
 
     def __hash__(self):
-        return hash(
-            ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
-        )
+        return self.cached()[0]
+
+    def __reduce__(self):
+        return type(self), self.conjuncts
 
     def __repr__(self):
         conjunctions = ", ".join(
@@ -114,35 +228,61 @@ class And(Sentence):
         return f"And({conjunctions})"
 
     def add(self, conjunct):
-        Sentence.validate(conjunct)
-        self.conjuncts.append(conjunct)
+        """Raises TypeError: sentences are interned, so never change."""
+        raise TypeError(
+            "And is immutable; use And(*knowledge.conjuncts, conjunct) "
+            "or KnowledgeBase.tell(conjunct) instead of add()"
+        )
 
     def evaluate(self, model):
         return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
 
+    def evaluate_partial(self, model):
+        result = True
+        for conjunct in self.conjuncts:
+            value = conjunct.evaluate_partial(model)
+            if value is False:
+                return False
+            if value is None:
+                result = None
+        return result
+
     def formula(self):
         if len(self.conjuncts) == 1:
             return self.conjuncts[0].formula()
         return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
                            for conjunct in self.conjuncts])
 
-    def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+    def parts(self):
+        return self.conjuncts
+
+    def summarize(self, inputs):
+        return (hash(("and", tuple(h for h, _ in inputs))),
+                frozenset().union(*[symbols for _, symbols in inputs]))
 
 
 class Or(Sentence):
-    def __init__(self, *disjuncts):
-        for disjunct in disjuncts:
-            Sentence.validate(disjunct)
-        self.disjuncts = list(disjuncts)
+    __slots__ = ("_parts",)
+    interned = weakref.WeakValueDictionary()
+
+    def __new__(cls, *disjuncts):
+        return cls.intern_parts(disjuncts)
+
+    @property
+    def disjuncts(self):
+        return self._parts
 
     def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
+        return self is other or (
+            isinstance(other, Or) and hash(self) == hash(other)
+            and self.disjuncts == other.disjuncts
+        )
 
     def __hash__(self):
-        return hash(
-            ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
-        )
+        return self.cached()[0]
+
+    def __reduce__(self):
+        return type(self), self.disjuncts
 
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
@@ -151,30 +291,56 @@ class Or(Sentence):
     def evaluate(self, model):
         return any(disjunct.evaluate(model) for disjunct in self.disjuncts)
 
+    def evaluate_partial(self, model):
+        result = False
+        for disjunct in self.disjuncts:
+            value = disjunct.evaluate_partial(model)
+            if value is True:
+                return True
+            if value is None:
+                result = None
+        return result
+
     def formula(self):
         if len(self.disjuncts) == 1:
             return self.disjuncts[0].formula()
         return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
                             for disjunct in self.disjuncts])
 
-    def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+    def parts(self):
+        return self.disjuncts
+
+    def summarize(self, inputs):
+        return (hash(("or", tuple(h for h, _ in inputs))),
+                frozenset().union(*[symbols for _, symbols in inputs]))
 
 
 class Implication(Sentence):
-    def __init__(self, antecedent, consequent):
+    __slots__ = ("antecedent", "consequent")
+
+    def __new__(cls, antecedent, consequent):
         Sentence.validate(antecedent)
         Sentence.validate(consequent)
-        self.antecedent = antecedent
-        self.consequent = consequent
+
+        def create():
+            self = super(Implication, cls).__new__(cls)
+            self.antecedent = antecedent
+            self.consequent = consequent
+            return self
+        return Sentence.intern((cls, id(antecedent), id(consequent)), create)
 
     def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
+        return self is other or (
+            isinstance(other, Implication) and hash(self) == hash(other)
+            and self.antecedent == other.antecedent
+            and self.consequent == other.consequent
+        )
 
     def __hash__(self):
-        return hash(("implies", hash(self.antecedent), hash(self.consequent)))
+        return self.cached()[0]
+
+    def __reduce__(self):
+        return type(self), (self.antecedent, self.consequent)
 
     def __repr__(self):
         return f"Implication({self.antecedent}, {self.consequent})"
@@ -183,29 +349,57 @@ class Implication(Sentence):
         return ((not self.antecedent.evaluate(model))
                 or self.consequent.evaluate(model))
 
+    def evaluate_partial(self, model):
+        antecedent = self.antecedent.evaluate_partial(model)
+        if antecedent is False:
+            return True
+        consequent = self.consequent.evaluate_partial(model)
+        if consequent is True:
+            return True
+        if antecedent is None or consequent is None:
+            return None
+        return False
+
     def formula(self):
         antecedent = Sentence.parenthesize(self.antecedent.formula())
         consequent = Sentence.parenthesize(self.consequent.formula())
         return f"{antecedent} => {consequent}"
 
-    def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+    def parts(self):
+        return (self.antecedent, self.consequent)
+
+    def summarize(self, inputs):
+        (antecedent_hash, antecedent_symbols), (consequent_hash, consequent_symbols) = inputs
+        return (hash(("implies", antecedent_hash, consequent_hash)),
+                antecedent_symbols | consequent_symbols)
 
 
 class Biconditional(Sentence):
-    def __init__(self, left, right):
+    __slots__ = ("left", "right")
+
+    def __new__(cls, left, right):
         Sentence.validate(left)
         Sentence.validate(right)
-        self.left = left
-        self.right = right
+
+        def create():
+            self = super(Biconditional, cls).__new__(cls)
+            self.left = left
+            self.right = right
+            return self
+        return Sentence.intern((cls, id(left), id(right)), create)
 
     def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
+        return self is other or (
+            isinstance(other, Biconditional) and hash(self) == hash(other)
+            and self.left == other.left
+            and self.right == other.right
+        )
 
     def __hash__(self):
-        return hash(("biconditional", hash(self.left), hash(self.right)))
+        return self.cached()[0]
+
+    def __reduce__(self):
+        return type(self), (self.left, self.right)
 
     def __repr__(self):
         return f"Biconditional({self.left}, {self.right})"
@@ -216,48 +410,322 @@ class Biconditional(Sentence):
                 or (not self.left.evaluate(model)
                     and not self.right.evaluate(model)))
 
+    def evaluate_partial(self, model):
+        left = self.left.evaluate_partial(model)
+        if left is None:
+            return None
+        right = self.right.evaluate_partial(model)
+        if right is None:
+            return None
+        return left == right
+
     def formula(self):
         left = Sentence.parenthesize(str(self.left))
         right = Sentence.parenthesize(str(self.right))
         return f"{left} <=> {right}"
 
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
-
-
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
+    def parts(self):
+        return (self.left, self.right)
 
-    def check_all(knowledge, query, symbols, model):
-        """Checks if knowledge base entails query, given a particular model."""
+    def summarize(self, inputs):
+        (left_hash, left_symbols), (right_hash, right_symbols) = inputs
+        return (hash(("biconditional", left_hash, right_hash)),
+                left_symbols | right_symbols)
 
-        # If model has an assignment for each symbol
-        if not symbols:
 
-            # If knowledge base is true in model, then query must also be true
-            if knowledge.evaluate(model):
-                return query.evaluate(model)
-            return True
-        else:
+def model_check(knowledge, query, stats=None):
+    """Checks if knowledge base entails query.
 
-            # Choose one of the remaining unused symbols
-            remaining = symbols.copy()
-            p = remaining.pop()
+    Symbols are assigned one at a time in a depth-first walk, and the
+    knowledge base and query are evaluated in three-valued logic after
+    each assignment. A partial model already making the knowledge base
+    false or the query true settles every model extending it, so that
+    whole subtree is skipped.
 
-            # Create a model where the symbol is true
-            model_true = model.copy()
-            model_true[p] = True
+    Each symbol starts from the value it last had, so consecutive
+    complete models differ in a single symbol (a reflected Gray code)
+    and one model dict is updated in place throughout.
 
-            # Create a model where the symbol is false
-            model_false = model.copy()
-            model_false[p] = False
-
-            # Ensure entailment holds in both models
-            return (check_all(knowledge, query, remaining, model_true) and
-                    check_all(knowledge, query, remaining, model_false))
+    If `stats` is a dict, the number of complete models visited and of
+    models settled without visiting them are added to it under
+    "visited" and "pruned".
+    """
 
     # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
-
-    # Check that knowledge entails query
-    return check_all(knowledge, query, symbols, dict())
+    symbols = sorted(set.union(knowledge.symbols(), query.symbols()))
+
+    entailed, visited, pruned = check_extensions(knowledge, query, symbols, {})
+    if stats is not None:
+        stats["visited"] = stats.get("visited", 0) + visited
+        stats["pruned"] = stats.get("pruned", 0) + pruned
+    return entailed
+
+
+def check_extensions(knowledge, query, symbols, model, stop=None):
+    """Checks entailment in every extension of model to the given symbols.
+
+    Returns (entailed, visited, pruned) as described in model_check,
+    with entailed None if the `stop` event was set before finishing.
+    """
+    model = dict(model)
+    base = len(model)
+    count = len(symbols)
+    phase = [False] * count
+    tried = [0] * count
+    visited = pruned = steps = 0
+
+    while True:
+        steps += 1
+        if stop is not None and not steps % CHECK_STOP_EVERY and stop.is_set():
+            return None, visited, pruned
+
+        depth = len(model) - base
+        known = knowledge.evaluate_partial(model)
+        settled = known is False
+        if not settled:
+            answer = query.evaluate_partial(model)
+            if known is True and answer is False:
+                # Every model extending this one is a counter-model
+                return False, visited, pruned
+            settled = answer is True
+
+        if depth == count:
+            visited += 1
+        elif settled:
+            pruned += 1 << (count - depth)
+        else:
+            # Assign the next symbol, starting from its last value
+            tried[depth] = 1
+            model[symbols[depth]] = phase[depth]
+            continue
+
+        # Flip the deepest symbol with a value left to try
+        while depth and tried[depth - 1] == 2:
+            depth -= 1
+            phase[depth] = model.pop(symbols[depth])
+        if not depth:
+            return True, visited, pruned
+        tried[depth - 1] = 2
+        model[symbols[depth - 1]] = not model[symbols[depth - 1]]
+
+
+# Worker state for parallel_model_check, set by init_worker in each process
+worker = {}
+
+
+def init_worker(knowledge, query, symbols, stop):
+    worker.update(knowledge=knowledge, query=query, symbols=symbols, stop=stop)
+
+
+def check_subspace(prefix):
+    """Checks entailment in the models starting with the prefix values."""
+    symbols = worker["symbols"]
+    model = dict(zip(symbols, prefix))
+    result = check_extensions(worker["knowledge"], worker["query"],
+                              symbols[len(prefix):], model, worker["stop"])
+    if result[0] is False:
+        worker["stop"].set()
+    return result
+
+
+def parallel_model_check(knowledge, query, processes=None, split=None, stats=None):
+    """Checks if knowledge base entails query using a pool of processes.
+
+    The first `split` symbols are fixed in each of their 2^split
+    combinations, and the resulting subspaces are checked as separate
+    tasks. By default there are about four tasks per process. Once any
+    worker finds a counter-model, the others stop at their next check
+    of a shared event and the pool is terminated.
+    """
+    symbols = sorted(set.union(knowledge.symbols(), query.symbols()))
+    processes = processes or os.cpu_count()
+    if split is None:
+        split = (4 * processes - 1).bit_length()
+    split = min(split, len(symbols))
+    if processes == 1 or split == 0:
+        return model_check(knowledge, query, stats)
+
+    context = multiprocessing.get_context()
+    stop = context.Event()
+    visited = pruned = 0
+    entailed = True
+    with context.Pool(processes, init_worker, (knowledge, query, symbols, stop)) as pool:
+        prefixes = itertools.product((False, True), repeat=split)
+        for result, subspace_visited, subspace_pruned in pool.imap_unordered(check_subspace, prefixes):
+            visited += subspace_visited
+            pruned += subspace_pruned
+            if result is False:
+                entailed = False
+                break
+
+    if stats is not None:
+        stats["visited"] = stats.get("visited", 0) + visited
+        stats["pruned"] = stats.get("pruned", 0) + pruned
+    return entailed
+
+
+def symbol_masks(symbols):
+    """Returns a truth table bitset for each of the ordered symbols.
+
+    Bit m of a truth table holds the sentence's value in model m, where
+    symbol i is true in model m if bit i of m is set.
+    """
+    models = 1 << len(symbols)
+    masks = {}
+    for i, symbol in enumerate(symbols):
+        width = 1 << i
+        # width clear bits then width set bits, doubled to fill all models
+        bits = ((1 << width) - 1) << width
+        length = 2 * width
+        while length < models:
+            bits |= bits << length
+            length *= 2
+        masks[symbol] = bits
+    return masks
+
+
+def truth_table(sentence, masks, full, cache=None):
+    """Returns the bitset of models in which the sentence is true.
+
+    All models are evaluated at once with big-int bitwise operations.
+    Subexpressions found in `cache` are reused, so sharing one cache
+    across sentences evaluates their common parts only once.
+    """
+    if cache is None:
+        cache = {}
+
+    def table(sentence):
+        try:
+            return cache[sentence]
+        except KeyError:
+            pass
+        if isinstance(sentence, Symbol):
+            try:
+                bits = masks[sentence.name]
+            except KeyError:
+                raise Exception(f"variable {sentence.name} not in model")
+        elif isinstance(sentence, Not):
+            bits = full ^ table(sentence.operand)
+        elif isinstance(sentence, And):
+            bits = full
+            for conjunct in sentence.conjuncts:
+                bits &= table(conjunct)
+                if not bits:
+                    break
+        elif isinstance(sentence, Or):
+            bits = 0
+            for disjunct in sentence.disjuncts:
+                bits |= table(disjunct)
+                if bits == full:
+                    break
+        elif isinstance(sentence, Implication):
+            bits = (full ^ table(sentence.antecedent)) | table(sentence.consequent)
+        elif isinstance(sentence, Biconditional):
+            bits = full ^ table(sentence.left) ^ table(sentence.right)
+        else:
+            raise TypeError(f"cannot compile {type(sentence).__name__}")
+        cache[sentence] = bits
+        return bits
+
+    # table refers to itself through its closure, so break that cycle
+    # to free a throwaway cache as soon as this returns
+    try:
+        return table(sentence)
+    finally:
+        table = None
+
+
+def bitset_check(knowledge, query):
+    """Checks if knowledge base entails query using truth table bitsets.
+
+    Equivalent to model_check, but evaluates every model in one pass over
+    the sentences instead of walking them once per model. Memory grows as
+    2^n bits per subexpression, which is practical up to about 25 symbols.
+    """
+    symbols = sorted(set.union(knowledge.symbols(), query.symbols()))
+    masks = symbol_masks(symbols)
+    full = (1 << (1 << len(symbols))) - 1
+    cache = {}
+
+    # Every model of the knowledge base must be a model of the query
+    models = truth_table(knowledge, masks, full, cache)
+    return models & ~truth_table(query, masks, full, cache) == 0
+
+
+def model_check_batch(knowledge, queries):
+    """Checks which of the queries the knowledge base entails.
+
+    Returns a list of booleans parallel to `queries`. The models of the
+    knowledge base are computed once and shared by every query, so the
+    whole batch costs about as much as a single bitset_check.
+    """
+    queries = list(queries)
+    symbols = sorted(set.union(knowledge.symbols(), *[q.symbols() for q in queries]))
+    masks = symbol_masks(symbols)
+    full = (1 << (1 << len(symbols))) - 1
+    cache = {}
+
+    models = truth_table(knowledge, masks, full, cache)
+    return [models & ~truth_table(query, masks, full, cache) == 0
+            for query in queries]
+
+
+class KnowledgeBase():
+    """A conjunction of sentences that grows with tell() and answers ask().
+
+    The bitset of models satisfying every sentence told so far is kept
+    up to date, so telling a sentence only evaluates that sentence and
+    asking only evaluates the query. A sentence with symbols not seen
+    before doubles the model bitsets once per new symbol, with the new
+    symbol unconstrained.
+
+    Only the symbol masks and the models bitset are kept between calls;
+    the tables of subexpressions live for one tell() or ask(), so memory
+    does not grow with the number of sentences told.
+    """
+
+    def __init__(self, *sentences):
+        self.sentences = []
+        self.names = []
+        self.masks = {}
+        self.full = 1
+        self.models = 1
+        for sentence in sentences:
+            self.tell(sentence)
+
+    def extend(self, sentence):
+        """Adds the symbols of sentence that are not yet in the models."""
+        for name in sentence.symbols() - self.masks.keys():
+            count = 1 << len(self.names)
+
+            # The models so far, copied once with the new symbol false
+            # and once with it true
+            for known in self.masks:
+                self.masks[known] |= self.masks[known] << count
+            self.models |= self.models << count
+            self.masks[name] = ((1 << count) - 1) << count
+            self.full = (1 << (2 * count)) - 1
+            self.names.append(name)
+
+    def table(self, sentence):
+        self.extend(sentence)
+        return truth_table(sentence, self.masks, self.full)
+
+    def tell(self, sentence):
+        """Adds sentence to the knowledge base."""
+        Sentence.validate(sentence)
+
+        # Evaluated first, as new symbols widen self.models
+        table = self.table(sentence)
+        self.models &= table
+        self.sentences.append(sentence)
+
+    def ask(self, query):
+        """Checks if the knowledge base entails query."""
+        Sentence.validate(query)
+        table = self.table(query)
+        return self.models & ~table == 0
+
+    def satisfiable(self):
+        """Checks if some model satisfies every sentence told so far."""
+        return self.models != 0
@@ -0,0 +1,416 @@
+"""
+SAT-based entailment for logic sentences: Tseitin CNF encoding and a
+CDCL solver with two watched literals and first-UIP clause learning
+"""
+
+import heapq
+
+from logic import And, Biconditional, Implication, Not, Or, Symbol
+
+# Conflicts before the first restart, and the growth factor between restarts
+RESTART_FIRST = 100
+RESTART_GROWTH = 1.5
+
+# Variable activity decay applied after every conflict
+ACTIVITY_DECAY = 0.95
+
+
+class Solver():
+    """
+    Conflict-driven clause learning SAT solver.
+
+    Variables are positive integers from new_var() and literals are
+    nonzero integers, negative for a negated variable, as in DIMACS.
+    """
+
+    def __init__(self):
+        self.ok = True
+        self.variables = 0
+        self.clauses = []
+        self.learnts = []
+        self.model = None
+
+        # Indexed by variable; index 0 is unused
+        self.assign = [0]
+        self.level = [0]
+        self.reason = [None]
+        self.activity = [0.0]
+        self.polarity = [False]
+
+        self.watches = {}
+        self.trail = []
+        self.trail_lim = []
+        self.qhead = 0
+        self.order = []
+        self.increment = 1.0
+        self.stats = {"decisions": 0, "propagations": 0, "conflicts": 0, "restarts": 0}
+
+    def new_var(self):
+        self.variables += 1
+        v = self.variables
+        self.assign.append(0)
+        self.level.append(0)
+        self.reason.append(None)
+        self.activity.append(0.0)
+        self.polarity.append(False)
+        self.watches[v] = []
+        self.watches[-v] = []
+        heapq.heappush(self.order, (0.0, v))
+        return v
+
+    def value(self, literal):
+        """
+        Returns 1 if the literal is true, -1 if false, 0 if unassigned.
+        """
+        v = self.assign[abs(literal)]
+        return v if literal > 0 else -v
+
+    def decision_level(self):
+        return len(self.trail_lim)
+
+    def add_clause(self, literals):
+        """
+        Adds a clause of literals, returning False if the clauses have
+        become unsatisfiable.
+        """
+        if not self.ok:
+            return False
+        self.cancel_until(0)
+
+        clause = []
+        for literal in dict.fromkeys(literals):
+            if -literal in clause or self.value(literal) == 1:
+                return True
+            if self.value(literal) == 0:
+                clause.append(literal)
+
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self.enqueue(clause[0], None)
+            self.ok = self.propagate() is None
+        else:
+            self.watch(clause)
+            self.clauses.append(clause)
+        return self.ok
+
+    def watch(self, clause):
+        self.watches[clause[0]].append(clause)
+        self.watches[clause[1]].append(clause)
+
+    def enqueue(self, literal, reason):
+        v = abs(literal)
+        self.assign[v] = 1 if literal > 0 else -1
+        self.level[v] = self.decision_level()
+        self.reason[v] = reason
+        self.trail.append(literal)
+
+    def propagate(self):
+        """
+        Assigns every literal implied by unit clauses, returning the
+        conflicting clause if one becomes false, otherwise None.
+
+        Each clause watches its first two literals and is only visited
+        when one of those becomes false, at which point it either finds
+        another non-false literal to watch or implies its other watch.
+        """
+        assign = self.assign
+        trail = self.trail
+        while self.qhead < len(trail):
+            false_literal = -trail[self.qhead]
+            self.qhead += 1
+            self.stats["propagations"] += 1
+
+            watchers = self.watches[false_literal]
+            kept = []
+            for i, clause in enumerate(watchers):
+                if clause[0] == false_literal:
+                    clause[0], clause[1] = clause[1], clause[0]
+                first = clause[0]
+                v = assign[abs(first)]
+                if (v if first > 0 else -v) == 1:
+                    kept.append(clause)
+                    continue
+
+                for k in range(2, len(clause)):
+                    other = clause[k]
+                    v = assign[abs(other)]
+                    if (v if other > 0 else -v) != -1:
+                        clause[1], clause[k] = other, false_literal
+                        self.watches[other].append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if self.value(first) == -1:
+                        kept.extend(watchers[i + 1:])
+                        self.watches[false_literal] = kept
+                        self.qhead = len(trail)
+                        return clause
+                    self.enqueue(first, clause)
+            self.watches[false_literal] = kept
+        return None
+
+    def analyze(self, conflict):
+        """
+        Returns the first-UIP clause learned from a conflict, asserting
+        literal first and a literal from the backjump level second, and
+        the level to backjump to.
+        """
+        level = self.decision_level()
+        seen = set()
+        learnt = [None]
+        pending = 0
+        literal = None
+        index = len(self.trail) - 1
+        clause = conflict
+
+        while True:
+            for q in (clause if literal is None else clause[1:]):
+                v = abs(q)
+                if v not in seen and self.level[v] > 0:
+                    seen.add(v)
+                    self.bump(v)
+                    if self.level[v] == level:
+                        pending += 1
+                    else:
+                        learnt.append(q)
+
+            # Walk back along the trail to the next literal in the conflict
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            literal = self.trail[index]
+            index -= 1
+            clause = self.reason[abs(literal)]
+            pending -= 1
+            if pending == 0:
+                break
+
+        learnt[0] = -literal
+        if len(learnt) == 1:
+            return learnt, 0
+        deepest = max(range(1, len(learnt)), key=lambda i: self.level[abs(learnt[i])])
+        learnt[1], learnt[deepest] = learnt[deepest], learnt[1]
+        return learnt, self.level[abs(learnt[1])]
+
+    def bump(self, v):
+        self.activity[v] += self.increment
+        if self.activity[v] > 1e100:
+            self.activity = [a * 1e-100 for a in self.activity]
+            self.increment *= 1e-100
+            self.order = [(-a, v) for v, a in enumerate(self.activity) if v]
+            heapq.heapify(self.order)
+        heapq.heappush(self.order, (-self.activity[v], v))
+
+    def cancel_until(self, level):
+        """
+        Undoes assignments above decision level `level`.
+        """
+        if self.decision_level() <= level:
+            return
+        start = self.trail_lim[level]
+        for literal in self.trail[start:]:
+            v = abs(literal)
+            self.polarity[v] = literal > 0
+            self.assign[v] = 0
+            self.reason[v] = None
+            heapq.heappush(self.order, (-self.activity[v], v))
+        del self.trail[start:]
+        del self.trail_lim[level:]
+        self.qhead = start
+
+    def pick(self):
+        """
+        Returns the unassigned variable with the highest activity, or
+        None if every variable is assigned.
+        """
+        while self.order:
+            _, v = heapq.heappop(self.order)
+            if not self.assign[v]:
+                return v
+        return None
+
+    def decide(self, literal):
+        self.trail_lim.append(len(self.trail))
+        if literal is not None:
+            self.enqueue(literal, None)
+
+    def solve(self, assumptions=()):
+        """
+        Returns True if the clauses are satisfiable with every literal in
+        `assumptions` true, storing a satisfying assignment in
+        self.model, and False otherwise.
+
+        Assumptions only apply to this call, so learned clauses carry
+        over to later calls with different assumptions.
+        """
+        self.model = None
+        if not self.ok:
+            return False
+        self.cancel_until(0)
+
+        restart = RESTART_FIRST
+        conflicts = 0
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.stats["conflicts"] += 1
+                if self.decision_level() == 0:
+                    self.ok = False
+                    return False
+                learnt, level = self.analyze(conflict)
+                self.cancel_until(level)
+                if len(learnt) == 1:
+                    self.enqueue(learnt[0], None)
+                else:
+                    self.watch(learnt)
+                    self.learnts.append(learnt)
+                    self.enqueue(learnt[0], learnt)
+                self.increment /= ACTIVITY_DECAY
+
+                conflicts += 1
+                if conflicts >= restart:
+                    self.stats["restarts"] += 1
+                    self.cancel_until(0)
+                    conflicts = 0
+                    restart *= RESTART_GROWTH
+                continue
+
+            # Assumptions take the first decision levels, one each
+            level = self.decision_level()
+            if level < len(assumptions):
+                assumption = assumptions[level]
+                value = self.value(assumption)
+                if value == -1:
+                    self.cancel_until(0)
+                    return False
+                self.decide(assumption if value == 0 else None)
+                continue
+
+            v = self.pick()
+            if v is None:
+                self.model = [a == 1 for a in self.assign]
+                self.cancel_until(0)
+                return True
+            self.stats["decisions"] += 1
+            self.decide(v if self.polarity[v] else -v)
+
+
+class Encoder():
+    """
+    Adds logic sentences to a Solver as clauses using the Tseitin
+    encoding: every compound subformula gets a variable constrained to
+    equal it, so the clauses grow linearly with the sentence. Equal
+    subformulas share one variable.
+    """
+
+    def __init__(self, solver=None):
+        self.solver = Solver() if solver is None else solver
+        self.variables = {}
+        self.literals = {}
+
+    def variable(self, name):
+        """
+        Returns the solver variable for the symbol called `name`.
+        """
+        if name not in self.variables:
+            self.variables[name] = self.solver.new_var()
+        return self.variables[name]
+
+    def literal(self, sentence):
+        """
+        Returns a literal that is true exactly when `sentence` is.
+        """
+        if isinstance(sentence, Symbol):
+            return self.variable(sentence.name)
+        if isinstance(sentence, Not):
+            return -self.literal(sentence.operand)
+        if sentence in self.literals:
+            return self.literals[sentence]
+
+        add = self.solver.add_clause
+        if isinstance(sentence, (And, Or)):
+            operands = sentence.conjuncts if isinstance(sentence, And) else sentence.disjuncts
+            children = [self.literal(operand) for operand in operands]
+            if len(children) == 1:
+                return children[0]
+
+            # Or is encoded as the negation of And over negated children
+            sign = 1 if isinstance(sentence, And) else -1
+            children = [sign * child for child in children]
+            v = self.solver.new_var()
+            for child in children:
+                add([-v, child])
+            add([v] + [-child for child in children])
+            literal = sign * v
+        elif isinstance(sentence, Implication):
+            antecedent = self.literal(sentence.antecedent)
+            consequent = self.literal(sentence.consequent)
+            literal = self.solver.new_var()
+            add([-literal, -antecedent, consequent])
+            add([literal, antecedent])
+            add([literal, -consequent])
+        elif isinstance(sentence, Biconditional):
+            left = self.literal(sentence.left)
+            right = self.literal(sentence.right)
+            literal = self.solver.new_var()
+            add([-literal, -left, right])
+            add([-literal, left, -right])
+            add([literal, left, right])
+            add([literal, -left, -right])
+        else:
+            raise TypeError(f"cannot encode {type(sentence).__name__}")
+
+        self.literals[sentence] = literal
+        return literal
+
+    def add(self, sentence):
+        """
+        Constrains `sentence` to be true.
+        """
+        if isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                self.add(conjunct)
+        elif isinstance(sentence, Or):
+            self.solver.add_clause([self.literal(disjunct) for disjunct in sentence.disjuncts])
+        else:
+            self.solver.add_clause([self.literal(sentence)])
+
+
+def entails(knowledge, query):
+    """Checks if knowledge base entails query using a SAT solver.
+
+    The knowledge base entails the query exactly when the knowledge base
+    together with the negated query has no satisfying assignment.
+    """
+    encoder = Encoder()
+    encoder.add(knowledge)
+    encoder.add(Not(query))
+    return not encoder.solver.solve()
+
+
+def entails_all(knowledge, queries):
+    """Checks which of the queries the knowledge base entails.
+
+    Returns a list of booleans parallel to `queries`, using one solver
+    for the whole batch: each query is a solve under the assumption that
+    it is false, so clauses learned for one query speed up the rest.
+    Any model found along the way refutes every query false in it
+    without another solve.
+    """
+    encoder = Encoder()
+    encoder.add(knowledge)
+    solver = encoder.solver
+    literals = [encoder.literal(query) for query in queries]
+
+    results = [None] * len(literals)
+    for i, literal in enumerate(literals):
+        if results[i] is not None:
+            continue
+        if not solver.solve([-literal]):
+            results[i] = True
+            continue
+        model = solver.model
+        for j in range(i, len(literals)):
+            if results[j] is None and model[abs(literals[j])] != (literals[j] > 0):
+                results[j] = False
+    return results